@@ -0,0 +1,62 @@
+"""Микробенчмарк разбора дат в сообщениях пользователей.
+
+Сравнивает собственную грамматику ``dates.parse_date_native`` с вызовом
+``dateparser.parse``, через который раньше проходило каждое сообщение, а
+также время импорта ``dateparser``::
+
+    python benchmarks/bench_dates.py
+"""
+
+import os
+import sys
+import time
+import timeit
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+from bookingassistant.dates import parse_date_native  # noqa: E402
+
+TODAY = date(2025, 7, 28)
+
+CORPUS = {
+    # Сообщения с датой
+    "relative": "завтра",
+    "in a week": "через неделю из Казани",
+    "day month": "5 авг в Москву",
+    "ordinal": "хочу уехать пятого августа на поезде",
+    "numeric": "05/08",
+    "iso": "2025-08-05",
+    "weekday": "в пятницу на автобусе",
+    # Сообщения без даты
+    "city only": "в Нижний Новгород",
+    "long prose": "Здравствуйте, подскажите пожалуйста, как доехать "
+    "до центра города с вокзала и сколько это будет стоить " * 5,
+}
+
+
+def main() -> None:
+    started = time.perf_counter()
+    import dateparser
+
+    print(f"dateparser import: {(time.perf_counter() - started) * 1e3:.0f} ms")
+
+    number = 200
+    print(f"{'case':<14}{'dateparser, us':>16}{'native, us':>12}{'speedup':>10}")
+    for name, text in CORPUS.items():
+        old = timeit.timeit(
+            lambda: dateparser.parse(text, languages=["ru"]), number=number
+        )
+        new = timeit.timeit(lambda: parse_date_native(text, TODAY), number=number)
+        print(
+            f"{name:<14}{old / number * 1e6:>16.1f}{new / number * 1e6:>12.1f}"
+            f"{old / new:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Микробенчмарк извлечения JSON из ответа YandexGPT.
+
+Сравнивает ``parser._extract_json`` с прежней посимвольной реализацией на
+типичных и неудобных ответах модели::
+
+    python benchmarks/bench_extract_json.py
+"""
+
+import json
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+from bookingassistant.parser import _extract_json  # noqa: E402
+
+
+def legacy_extract_json(text: str) -> str:
+    """Реализация до перехода на ``raw_decode``."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text.lstrip("json").strip()
+    start = None
+    depth = 0
+    result = None
+    for idx, char in enumerate(text):
+        if char == "{":
+            if depth == 0:
+                start = idx
+            depth += 1
+        elif char == "}":
+            if depth == 0:
+                continue
+            depth -= 1
+            if depth == 0 and start is not None:
+                candidate = text[start : idx + 1]
+                try:
+                    obj = json.loads(candidate)
+                    if isinstance(obj, dict):
+                        if any(k for k in obj.keys()) or result is None:
+                            result = candidate
+                except json.JSONDecodeError:
+                    pass
+                start = None
+    return result or text
+
+
+SLOTS = (
+    '{"origin": "Москва", "destination": "Санкт-Петербург", '
+    '"date": "2025-08-05", "transport": "train"}'
+)
+
+CASES = {
+    # Типичные ответы модели
+    "plain": SLOTS,
+    "fenced": f"```json\n{SLOTS}\n```",
+    "prose around": f"Вот результат разбора:\n{SLOTS}\nЕсли нужно, уточните дату.",
+    "two objects": '{"": 1}\n' + SLOTS,
+    "history": '{"action": "show", "destination": "", "limit": 5}',
+    # Неудобные случаи
+    "nested 50": '{"a": ' * 50 + "1" + "}" * 50,
+    "braces in strings": '{"comment": "' + "{}" * 200 + '", "action": "show"}',
+    "many objects": "\n".join([SLOTS] * 50),
+    "long prose": "Извините, не удалось понять запрос. " * 200,
+    "unbalanced": "{" * 500 + SLOTS,
+    # Незакрытые и слишком глубокие объекты: разбор должен быть линейным
+    "unclosed keys": '{"a" ' * 8000,
+    "unclosed nested": '{"a": ' * 900,
+    "nested 5000": '{"a": ' * 5000 + "1" + "}" * 5000,
+}
+
+
+def _per_call(func, text: str, number: int) -> float:
+    """Return microseconds per call or NaN if ``func`` blows the stack."""
+    try:
+        return timeit.timeit(lambda: func(text), number=number) / number * 1e6
+    except RecursionError:
+        return float("nan")
+
+
+def main() -> None:
+    print(f"{'case':<20}{'legacy, us':>14}{'raw_decode, us':>18}{'speedup':>10}")
+    for name, text in CASES.items():
+        # Длинные неудобные ответы гоняем реже, чтобы прогон был коротким
+        number = 2000 if len(text) < 10000 else 50
+        old = _per_call(legacy_extract_json, text, number)
+        new = _per_call(_extract_json, text, number)
+        print(f"{name:<20}{old:>14.1f}{new:>18.1f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,15 @@ from dotenv import load_dotenv
 # Подгружаем значения из .env файла
 load_dotenv()
 
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    """Прочитать булев флаг из переменной окружения."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 YANDEX_IAM_TOKEN = os.getenv("YANDEX_IAM_TOKEN")
 YANDEX_FOLDER_ID = os.getenv("YANDEX_FOLDER_ID")
@@ -14,5 +23,57 @@ MANAGER_BOT_TOKEN = os.getenv("MANAGER_BOT_TOKEN")
 MANAGER_CHAT_ID = os.getenv("MANAGER_CHAT_ID")
 PAYMENT_DETAILS = os.getenv("PAYMENT_DETAILS", "реквизиты не указаны")
 
+# Пул HTTP-соединений к YandexGPT (0 — без ограничения)
+GPT_POOL_LIMIT = int(os.getenv("GPT_POOL_LIMIT", "100"))
+GPT_POOL_LIMIT_PER_HOST = int(os.getenv("GPT_POOL_LIMIT_PER_HOST", "0"))
+GPT_DNS_CACHE_TTL = int(os.getenv("GPT_DNS_CACHE_TTL", "300"))
+GPT_KEEPALIVE_TIMEOUT = float(os.getenv("GPT_KEEPALIVE_TIMEOUT", "60"))
+
+# Автомат защиты YandexGPT: число сбоев подряд, порог медленного ответа (с),
+# пауза перед пробными запросами (с) и число пробных запросов
+GPT_BREAKER_FAILURES = int(os.getenv("GPT_BREAKER_FAILURES", "5"))
+GPT_BREAKER_SLOW_CALL = float(os.getenv("GPT_BREAKER_SLOW_CALL", "8"))
+GPT_BREAKER_COOLDOWN = float(os.getenv("GPT_BREAKER_COOLDOWN", "30"))
+GPT_BREAKER_PROBES = int(os.getenv("GPT_BREAKER_PROBES", "2"))
+
+# Ограничение частоты запросов к YandexGPT: запросов в секунду (0 — без
+# ограничения), размер всплеска и длина очереди ожидания
+GPT_RATE_LIMIT = float(os.getenv("GPT_RATE_LIMIT", "10"))
+GPT_RATE_BURST = float(os.getenv("GPT_RATE_BURST", "0"))
+GPT_QUEUE_SIZE = int(os.getenv("GPT_QUEUE_SIZE", "20"))
+
+# Повторы запросов к YandexGPT при временных ошибках: число попыток,
+# базовая и максимальная пауза между ними в секундах
+GPT_RETRY_ATTEMPTS = int(os.getenv("GPT_RETRY_ATTEMPTS", "3"))
+GPT_RETRY_BASE_DELAY = float(os.getenv("GPT_RETRY_BASE_DELAY", "0.2"))
+GPT_RETRY_MAX_DELAY = float(os.getenv("GPT_RETRY_MAX_DELAY", "2"))
+
+# Переопределение профилей запросов к модели в формате JSON, например
+# {"slots": {"max_tokens": 300}, "yesno": {"model": "yandexgpt-lite"}}
+GPT_PROFILES = os.getenv("GPT_PROFILES", "")
+
+# Один запрос к модели на сообщение (намерение + слоты) вместо двух
+COMBINED_PARSING = _env_flag("COMBINED_PARSING")
+
+# Структурированный вывод: JSON-схема передаётся модели, ответ проверяется
+# типизированной моделью вместо поиска JSON в тексте
+STRUCTURED_OUTPUT = _env_flag("STRUCTURED_OUTPUT")
+
+# Сокращённый шаблон извлечения слотов, чтобы отправлять меньше токенов
+COMPACT_PROMPTS = _env_flag("COMPACT_PROMPTS")
+
+# Общий бюджет времени на ответ модели в рамках одного сообщения, секунды
+# (0 — ждать до таймаута каждого запроса)
+UPDATE_BUDGET = float(os.getenv("UPDATE_BUDGET", "2.5"))
+
+# Потоковая выдача подтверждения и ответа «не понял»: сообщение появляется
+# с первым фрагментом и обновляется не чаще раза в STREAM_EDIT_INTERVAL секунд
+GPT_STREAMING = _env_flag("GPT_STREAMING")
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1"))
+
+# Пул заранее сгенерированных формулировок (0 — генерировать на лету)
+PHRASE_POOL_SIZE = int(os.getenv("PHRASE_POOL_SIZE", "5"))
+PHRASE_POOL_REFRESH = float(os.getenv("PHRASE_POOL_REFRESH", "1800"))
+
 if not TELEGRAM_BOT_TOKEN:
     raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
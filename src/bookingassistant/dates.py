@@ -0,0 +1,242 @@
+"""Разбор дат в русских сообщениях без внешних библиотек.
+
+Грамматика покрывает формы, которые пользователи пишут боту: "завтра",
+"через неделю", "5 авг", "пятого августа", "05/08", "2025-08-05" и дни
+недели. Библиотека ``dateparser`` тяжела при импорте и медленна на длинных
+сообщениях, поэтому она загружается только тогда, когда в тексте есть
+похожие на дату слова, но грамматика их не разобрала.
+"""
+
+import calendar
+import re
+from datetime import date, timedelta
+from typing import Optional
+
+from . import metrics
+from .gazetteer import normalize
+from .scanner import scan_message
+
+# Полные названия совпадают по основе с начала слова, сокращения — только
+# целым словом, иначе "мар" находится в "маршрутке", а "дек" — в "декоре"
+MONTHS = (
+    (r"январ\w*", "янв"),
+    (r"феврал\w*", "фев"),
+    (r"март\w*", "мар"),
+    (r"апрел\w*", "апр"),
+    (r"ма[йяе]", None),
+    (r"июн\w*", None),
+    (r"июл\w*", None),
+    (r"август\w*", "авг"),
+    (r"сентябр\w*", "сент|сен"),
+    (r"октябр\w*", "окт"),
+    (r"ноябр\w*", "нояб|ноя"),
+    (r"декабр\w*", "дек"),
+)
+
+
+def _month_pattern(full: str, short) -> str:
+    if short is None:
+        return rf"{full}\b"
+    return rf"{full}|(?:{short})\b\.?"
+
+
+_UNIT_ORDINALS = {
+    "перв": 1,
+    "втор": 2,
+    "трет": 3,
+    "четверт": 4,
+    "пят": 5,
+    "шест": 6,
+    "седьм": 7,
+    "восьм": 8,
+    "девят": 9,
+}
+_TEEN_ORDINALS = {
+    "десят": 10,
+    "одиннадцат": 11,
+    "двенадцат": 12,
+    "тринадцат": 13,
+    "четырнадцат": 14,
+    "пятнадцат": 15,
+    "шестнадцат": 16,
+    "семнадцат": 17,
+    "восемнадцат": 18,
+    "девятнадцат": 19,
+    "двадцат": 20,
+    "тридцат": 30,
+}
+
+
+def _ordinal_forms(stem: str) -> tuple:
+    # "третьего"/"третье", остальные — "пятого"/"пятое"
+    return ("ьего", "ье") if stem == "трет" else ("ого", "ое")
+
+
+def _build_ordinals() -> dict:
+    words = {}
+    for stem, number in {**_UNIT_ORDINALS, **_TEEN_ORDINALS}.items():
+        for ending in _ordinal_forms(stem):
+            words[stem + ending] = number
+    for tens, value in (("двадцать", 20), ("тридцать", 30)):
+        for stem, number in _UNIT_ORDINALS.items():
+            if value + number > 31:
+                break
+            for ending in _ordinal_forms(stem):
+                words[f"{tens} {stem}{ending}"] = value + number
+    return words
+
+
+# "пятого" -> 5, "двадцать первое" -> 21
+ORDINAL_DAYS = _build_ordinals()
+COUNT_WORDS = {
+    "один": 1,
+    "одну": 1,
+    "пару": 2,
+    "два": 2,
+    "две": 2,
+    "три": 3,
+    "четыре": 4,
+    "пять": 5,
+    "шесть": 6,
+    "семь": 7,
+    "восемь": 8,
+    "девять": 9,
+    "десять": 10,
+}
+RELATIVE_DAYS = {"сегодня": 0, "завтра": 1, "послезавтра": 2}
+
+
+def _alternation(words) -> str:
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+_DAY = rf"(?:\d{{1,2}}(?:-?(?:го|е|ое))?|{_alternation(ORDINAL_DAYS)})"
+_MONTH = "|".join(
+    rf"(?P<m{number}>{_month_pattern(*month)})"
+    for number, month in enumerate(MONTHS, start=1)
+)
+_DATE_RE = re.compile(
+    "|".join(
+        [
+            r"\b(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})\b",
+            r"\b(?P<num_d>\d{1,2})[./](?P<num_m>\d{1,2})"
+            r"(?:[./](?P<num_y>\d{4}|\d{2}))?(?![\d:])",
+            rf"\b(?P<word_d>{_DAY})\s+(?:{_MONTH})"
+            r"(?:\s+(?P<word_y>\d{4}))?",
+            rf"\b(?P<only_d>{_DAY})\s+числа\b",
+            rf"\b(?P<relative>{_alternation(RELATIVE_DAYS)})\b",
+            rf"\bчерез\s+(?:(?P<count>\d{{1,2}}|{_alternation(COUNT_WORDS)})\s+)?"
+            r"(?P<unit>дн[яей]\w*|день|недел\w*|месяц\w*)",
+        ]
+    )
+)
+# Слова, ради которых ещё стоит спросить dateparser
+_HINT_RE = re.compile(
+    rf"\d|через|следующ|\b(?:{'|'.join(_month_pattern(*m) for m in MONTHS)})"
+)
+
+
+def _day_number(text: str) -> int:
+    digits = re.match(r"\d+", text)
+    return int(digits.group()) if digits else ORDINAL_DAYS[text]
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(
+        year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1])
+    )
+
+
+def _year(text: Optional[str], default: int) -> int:
+    if not text:
+        return default
+    year = int(text)
+    return year + 2000 if year < 100 else year
+
+
+def _calendar_date(
+    year: Optional[str], month: int, day: int, today: date
+) -> Optional[date]:
+    """Build a date; without a year a past day means the next year."""
+    try:
+        result = date(_year(year, today.year), month, day)
+    except ValueError:
+        return None
+    if result < today and not year:
+        result = result.replace(year=result.year + 1)
+    return result
+
+
+def _resolve(match: re.Match, today: date) -> Optional[date]:
+    groups = match.groupdict()
+    if groups["iso_y"]:
+        return _calendar_date(
+            groups["iso_y"], int(groups["iso_m"]), int(groups["iso_d"]), today
+        )
+    if groups["num_d"]:
+        return _calendar_date(
+            groups["num_y"], int(groups["num_m"]), int(groups["num_d"]), today
+        )
+    if groups["word_d"]:
+        month = next(n for n in range(1, 13) if groups[f"m{n}"])
+        return _calendar_date(
+            groups["word_y"], month, _day_number(groups["word_d"]), today
+        )
+    if groups["only_d"]:
+        day = _day_number(groups["only_d"])
+        for months in (0, 1):
+            candidate = _add_months(today.replace(day=1), months)
+            if day <= calendar.monthrange(candidate.year, candidate.month)[1]:
+                candidate = candidate.replace(day=day)
+                if candidate >= today:
+                    return candidate
+        return None
+    if groups["relative"]:
+        return today + timedelta(days=RELATIVE_DAYS[groups["relative"]])
+    count = groups["count"]
+    count = int(count) if count and count.isdigit() else COUNT_WORDS.get(count, 1)
+    unit = groups["unit"]
+    if unit.startswith("месяц"):
+        return _add_months(today, count)
+    return today + timedelta(days=count * (7 if unit.startswith("недел") else 1))
+
+
+def parse_date_native(text: str, today: date) -> Optional[date]:
+    """Return the first date mentioned in ``text`` using the local grammar."""
+    low = normalize(text)
+    weekday = scan_message(text).of_kind("weekday")
+    for match in _DATE_RE.finditer(low):
+        if weekday and weekday[0].start < match.start():
+            break
+        result = _resolve(match, today)
+        if result is not None:
+            return result
+    if weekday:
+        return today + timedelta(days=(weekday[0].value - today.weekday() - 1) % 7 + 1)
+    return None
+
+
+def _parse_with_dateparser(text: str, today: date) -> Optional[date]:
+    import dateparser  # тяжёлый импорт, нужен редко
+
+    parsed = dateparser.parse(text, languages=["ru"])
+    return parsed.date() if parsed else None
+
+
+def parse_date(text: str, today: date) -> Optional[date]:
+    """Return date mentioned in ``text`` that is not in the past.
+
+    The native grammar is tried first; ``dateparser`` is consulted only when
+    the text contains digits or date words the grammar did not understand.
+    """
+    result = parse_date_native(text, today)
+    if result is not None:
+        metrics.incr("dates.native")
+    elif _HINT_RE.search(normalize(text)):
+        metrics.incr("dates.fallback")
+        result = _parse_with_dateparser(text, today)
+    if result is None or result < today:
+        return None
+    return result
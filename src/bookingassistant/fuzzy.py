@@ -0,0 +1,163 @@
+"""Нечёткий поиск: расстояние редактирования, индекс удалений и транслитерация.
+
+Используется для исправления опечаток и латиницы в названиях городов
+("Екатеринбур", "Moskva") без обращения к модели.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Сочетания проверяются раньше одиночных букв
+_LATIN_PAIRS = [
+    ("shch", "щ"),
+    ("sch", "щ"),
+    ("zh", "ж"),
+    ("kh", "х"),
+    ("ts", "ц"),
+    ("tz", "ц"),
+    ("ch", "ч"),
+    ("sh", "ш"),
+    ("yu", "ю"),
+    ("ju", "ю"),
+    ("iu", "ю"),
+    ("ya", "я"),
+    ("ja", "я"),
+    ("ia", "я"),
+    ("yo", "е"),
+    ("jo", "е"),
+    ("ye", "е"),
+    ("iy", "ий"),
+    ("yy", "ый"),
+]
+_LATIN_LETTERS = {
+    "a": "а",
+    "b": "б",
+    "v": "в",
+    "w": "в",
+    "g": "г",
+    "d": "д",
+    "e": "е",
+    "z": "з",
+    "i": "и",
+    "j": "й",
+    "k": "к",
+    "l": "л",
+    "m": "м",
+    "n": "н",
+    "o": "о",
+    "p": "п",
+    "r": "р",
+    "s": "с",
+    "t": "т",
+    "u": "у",
+    "f": "ф",
+    "h": "х",
+    "c": "к",
+    "q": "к",
+    "x": "кс",
+    "y": "ы",
+    "'": "ь",
+}
+
+
+def transliterate(text: str) -> str:
+    """Convert Latin transcription of a Russian name to Cyrillic."""
+    text = text.lower()
+    result: List[str] = []
+    i = 0
+    while i < len(text):
+        for latin, cyrillic in _LATIN_PAIRS:
+            if text.startswith(latin, i):
+                result.append(cyrillic)
+                i += len(latin)
+                break
+        else:
+            result.append(_LATIN_LETTERS.get(text[i], text[i]))
+            i += 1
+    return "".join(result)
+
+
+def max_typos(length: int) -> int:
+    """Return how many edits are tolerated in a word of ``length`` letters."""
+    if length < 5:
+        return 0
+    return 1 if length < 9 else 2
+
+
+def distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Return edit distance counting adjacent transpositions as one edit.
+
+    With ``limit`` only a diagonal band of the table is computed and
+    ``limit + 1`` is returned as soon as the distance is known to exceed it.
+    """
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if limit is None:
+        limit = max(la, lb)
+    if abs(la - lb) > limit:
+        return limit + 1
+    big = limit + 1
+    prev2: List[int] = []
+    prev = [j if j <= limit else big for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        ca = a[i - 1]
+        cur = [big] * (lb + 1)
+        cur[0] = i if i <= limit else big
+        row_min = cur[0]
+        for j in range(max(1, i - limit), min(lb, i + limit) + 1):
+            cb = b[j - 1]
+            value = prev[j - 1] if ca == cb else prev[j - 1] + 1
+            if prev[j] + 1 < value:
+                value = prev[j] + 1
+            if cur[j - 1] + 1 < value:
+                value = cur[j - 1] + 1
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, prev2[j - 2] + 1)
+            cur[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return big
+        prev2, prev = prev, cur
+    return min(prev[lb], big)
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    """Return ``word`` and all strings made by deleting up to ``depth`` letters."""
+    result = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+class DeletionIndex:
+    """Индекс удалений для поиска слов в пределах расстояния редактирования.
+
+    Для каждого слова заранее сохраняются варианты без одной-двух букв;
+    при поиске такие же варианты строятся для запроса, и расстояние
+    считается только для слов с общим вариантом.
+    """
+
+    def __init__(self, words: Iterable[str] = ()) -> None:
+        self._variants: Dict[str, Set[str]] = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        # Запрос может быть длиннее слова на число допустимых правок
+        for variant in _deletes(word, max_typos(len(word) + 2)):
+            self._variants.setdefault(variant, set()).add(word)
+
+    def search(self, word: str, tolerance: int) -> List[Tuple[int, str]]:
+        """Return ``(distance, word)`` pairs within ``tolerance``, closest first."""
+        candidates: Set[str] = set()
+        for variant in _deletes(word, tolerance):
+            candidates.update(self._variants.get(variant, ()))
+        found = []
+        for candidate in candidates:
+            dist = distance(word, candidate, tolerance)
+            if dist <= tolerance:
+                found.append((dist, candidate))
+        return sorted(found)
@@ -0,0 +1,268 @@
+"""Справочник городов для распознавания без обращения к модели.
+
+Названия и псевдонимы из ``data/cities.txt`` вместе с падежными формами
+("Москву", "из Казани", "в Нижнем Новгороде") загружаются в автомат
+Ахо — Корасик, который находит все упоминания городов в сообщении за один
+проход по тексту.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from itertools import product
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .fuzzy import DeletionIndex, max_typos, transliterate
+
+DATA_FILE = Path(__file__).resolve().parent / "data" / "cities.txt"
+
+VOWELS = set("аеёиоуыэюя")
+# После этих букв в родительном падеже пишется "и", а не "ы"
+_HUSHING = set("гкхжшчщ")
+# Окончания, в которых "е" или "о" выпадает при склонении
+_FLEETING_ENDINGS = ("ец", "ок", "ел")
+
+
+def normalize(text: str) -> str:
+    """Lower-case ``text`` and replace "ё" so that positions are kept."""
+    return text.lower().replace("ё", "е")
+
+
+def _decline_word(word: str) -> List[Set[str]]:
+    """Return forms of ``word`` for the six cases, nominative first.
+
+    Rules cover common city name patterns; extra forms that never occur in
+    real text are harmless.
+    """
+    cases: List[Set[str]] = [{word} for _ in range(6)]
+
+    def add(stem: str, gen, dat, acc, inst, prep) -> None:
+        for case, endings in zip(range(1, 6), (gen, dat, acc, inst, prep)):
+            cases[case].update(stem + ending for ending in endings)
+
+    if not any(ch in VOWELS for ch in word) or len(word) < 3:
+        return cases  # аббревиатуры вроде "спб" не склоняются
+    if word.endswith(("ий", "ый", "ой")):
+        stem = word[:-2]
+        soft = word.endswith("ний")
+        hard = "е" if soft else "о"
+        add(
+            stem,
+            (f"{hard}го",),
+            (f"{hard}му",),
+            (word[-2:],),
+            ("им" if soft or stem[-1] in _HUSHING else "ым",),
+            (f"{hard}м",),
+        )
+    elif word.endswith("ая"):
+        add(word[:-2], ("ой",), ("ой",), ("ую",), ("ой", "ою"), ("ой",))
+    elif word.endswith(("ое", "ее")):
+        add(word[:-2], ("ого",), ("ому",), (word[-2:],), ("ым",), ("ом",))
+    elif word.endswith(("ые", "ие")):
+        y = word[-2]
+        add(word[:-2], (f"{y}х",), (f"{y}м",), (word[-2:],), (f"{y}ми",), (f"{y}х",))
+    elif word.endswith("а"):
+        stem = word[:-1]
+        gen = "и" if stem[-1] in _HUSHING else "ы"
+        add(stem, (gen,), ("е",), ("у",), ("ой", "ою"), ("е",))
+    elif word.endswith("я"):
+        add(word[:-1], ("и",), ("е",), ("ю",), ("ей",), ("е", "и"))
+    elif word.endswith("ь"):
+        # Мужской ("Ярославль") и женский ("Казань") род
+        add(word[:-1], ("я", "и"), ("ю", "и"), ("ь",), ("ем", "ью"), ("е", "и"))
+    elif word.endswith(("ы", "и")):
+        # Множественное число ("Химки"); родительный падеж задаётся в справочнике
+        add(word[:-1], (), ("ам",), (word[-1],), ("ами",), ("ах",))
+    elif word.endswith(("о", "е")):
+        add(word[:-1], ("а",), ("у",), (word[-1],), ("ом",), ("е",))
+    elif word[-1] not in VOWELS:
+        add(word, ("а",), ("у",), ("",), ("ом", "ем"), ("е",))
+        if word.endswith(_FLEETING_ENDINGS) and word[-3] not in VOWELS:
+            # Беглая гласная: "Орёл" — "Орла", "Елец" — "Ельца", "Торжок" — "Торжка"
+            stem = word[:-2] + ("ь" if word[-3] == "л" else "") + word[-1]
+            add(stem, ("а",), ("у",), (), ("ом", "ем"), ("е",))
+    return cases
+
+
+def _decline_part(part: str) -> List[Set[str]]:
+    """Decline a hyphenated name ("ростов-на-дону", "йошкар-ола")."""
+    pieces = part.split("-")
+    if len(pieces) == 1:
+        return _decline_word(part)
+    if "на" in pieces[1:-1]:
+        first = _decline_word(pieces[0])
+        tail = "-".join(pieces[1:])
+        return [{f"{form}-{tail}" for form in forms} for forms in first]
+    head = "-".join(pieces[:-1])
+    last = _decline_word(pieces[-1])
+    both = [
+        {"-".join(combo) for combo in product(*cases)}
+        for cases in zip(*(_decline_word(piece) for piece in pieces))
+    ]
+    return [
+        {f"{head}-{form}" for form in last_forms} | all_forms
+        for last_forms, all_forms in zip(last, both)
+    ]
+
+
+def inflections(name: str) -> Set[str]:
+    """Return normalized case forms of a (possibly multi-word) ``name``."""
+    words = [_decline_part(word) for word in normalize(name).split()]
+    forms: Set[str] = set()
+    for case in range(6):
+        forms.update(" ".join(combo) for combo in product(*(w[case] for w in words)))
+    return forms
+
+
+@dataclass(frozen=True)
+class CityMatch:
+    """Упоминание города в тексте: позиции в исходной строке."""
+
+    city: str
+    start: int
+    end: int
+
+
+class _Automaton:
+    """Aho-Corasick automaton over normalized strings."""
+
+    def __init__(self) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[int, str]]] = [[]]
+
+    def add(self, pattern: str, value: str) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append((len(pattern), value))
+
+    def build(self) -> None:
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                fail = self.fail[node]
+                while fail and ch not in self.goto[fail]:
+                    fail = self.fail[fail]
+                target = self.goto[fail].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def scan(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield ``(start, end, value)`` for every pattern occurrence."""
+        node = 0
+        for index, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for length, value in self.out[node]:
+                yield index + 1 - length, index + 1, value
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "-"
+
+
+class Gazetteer:
+    """Поиск городов и их форм в тексте."""
+
+    def __init__(self, entries: Iterable[Tuple[str, Iterable[str]]]) -> None:
+        self._automaton = _Automaton()
+        self._forms: Dict[str, str] = {}
+        self.cities: List[str] = []
+        for city, aliases in entries:
+            self.cities.append(city)
+            forms = inflections(city)
+            for alias in aliases:
+                if alias.startswith("="):
+                    forms.add(normalize(alias[1:]))
+                else:
+                    forms.update(inflections(alias))
+            for form in forms:
+                # Первое вхождение формы в справочнике имеет приоритет
+                if form not in self._forms:
+                    self._forms[form] = city
+                    self._automaton.add(form, city)
+        self._automaton.build()
+
+    def canonical(self, name: str) -> Optional[str]:
+        """Return official city name for a name, alias or case form."""
+        return self._forms.get(" ".join(normalize(name).split()))
+
+    @cached_property
+    def _fuzzy(self) -> DeletionIndex:
+        # Строится при первом нечётком поиске
+        return DeletionIndex(self._forms)
+
+    def correct(self, name: str) -> Optional[Tuple[str, float]]:
+        """Return ``(city, confidence)`` for a misspelt or Latin ``name``.
+
+        Confidence is ``1.0`` for an exact form and drops with every edit;
+        ``None`` is returned when nothing is close enough or two different
+        cities are equally close.
+        """
+        query = " ".join(normalize(name).split())
+        city = self._forms.get(query)
+        if not city and any("a" <= ch <= "z" for ch in query):
+            query = transliterate(query)
+            city = self._forms.get(query)
+        if city:
+            return city, 1.0
+        tolerance = max_typos(len(query))
+        found = self._fuzzy.search(query, tolerance) if tolerance else []
+        if not found:
+            return None
+        best = found[0][0]
+        cities = {self._forms[form] for dist, form in found if dist == best}
+        if len(cities) > 1:
+            return None
+        return cities.pop(), round(1 - best / len(query), 2)
+
+    def find(self, text: str) -> List[CityMatch]:
+        """Return non-overlapping city mentions, longest match first."""
+        low = normalize(text)
+        candidates = [
+            (start, end, city)
+            for start, end, city in self._automaton.scan(low)
+            if (start == 0 or not _is_word_char(low[start - 1]))
+            and (end == len(low) or not _is_word_char(low[end]))
+        ]
+        candidates.sort(key=lambda item: (item[0], item[0] - item[1]))
+        matches: List[CityMatch] = []
+        last_end = 0
+        for start, end, city in candidates:
+            if start >= last_end:
+                matches.append(CityMatch(city, start, end))
+                last_end = end
+        return matches
+
+
+def load_gazetteer(path: Path = DATA_FILE) -> Gazetteer:
+    """Read ``path`` in the ``name|alias|...`` format."""
+    entries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        city, *aliases = (part.strip() for part in line.split("|"))
+        entries.append((city, [alias for alias in aliases if alias]))
+    return Gazetteer(entries)
+
+
+gazetteer = load_gazetteer()
+
+
+@lru_cache(maxsize=256)
+def find_cities(text: str) -> Tuple[CityMatch, ...]:
+    """Return cached city mentions in ``text``."""
+    return tuple(gazetteer.find(text))
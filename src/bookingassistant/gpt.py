@@ -1,62 +1,715 @@
 import asyncio
+import heapq
+import itertools
+import json
 import logging
+import random
 import ssl
-from typing import Any
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional, TypeVar
 
 import aiohttp
 import certifi
 
-from .config import YANDEX_IAM_TOKEN, YANDEX_FOLDER_ID
-from .prompts import BASE_PROMPT
+from .config import (
+    YANDEX_IAM_TOKEN,
+    GPT_POOL_LIMIT,
+    GPT_POOL_LIMIT_PER_HOST,
+    GPT_DNS_CACHE_TTL,
+    GPT_KEEPALIVE_TIMEOUT,
+    GPT_BREAKER_FAILURES,
+    GPT_BREAKER_SLOW_CALL,
+    GPT_BREAKER_COOLDOWN,
+    GPT_BREAKER_PROBES,
+    GPT_RATE_LIMIT,
+    GPT_RATE_BURST,
+    GPT_QUEUE_SIZE,
+    GPT_RETRY_ATTEMPTS,
+    GPT_RETRY_BASE_DELAY,
+    GPT_RETRY_MAX_DELAY,
+)
+from .profiles import CallProfile, get_profile
+from . import metrics
 
 API_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
-MODEL_URI = f"gpt://{YANDEX_FOLDER_ID}/yandexgpt-lite"
 
 # Shared SSL context using certifi certificate bundle
 SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
 
+# Process-wide session with a keep-alive connection pool. It is bound to the
+# event loop it was created in and recreated transparently for a new loop.
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+T = TypeVar("T")
+
+
+class GPTUnavailableError(Exception):
+    """Raised when a call is refused locally without reaching YandexGPT."""
+
+    pass
+
+
+class CircuitOpenError(GPTUnavailableError):
+    """Raised when YandexGPT calls are suspended by the circuit breaker."""
+
+    pass
+
+
+class RateLimitExceeded(GPTUnavailableError):
+    """Raised when low-priority work is dropped because the queue is full."""
+
+    pass
+
+
+# Priority classes: lower value is served first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Extraction and yes/no parsing decide the dialogue; generated wording is
+# cosmetic and has a static fallback.
+CALL_PRIORITIES = {
+    "slots": PRIORITY_HIGH,
+    "complete": PRIORITY_HIGH,
+    "intent": PRIORITY_HIGH,
+    "history": PRIORITY_HIGH,
+    "yesno": PRIORITY_HIGH,
+    "time": PRIORITY_NORMAL,
+    "question": PRIORITY_LOW,
+    "confirmation": PRIORITY_LOW,
+    "fallback": PRIORITY_LOW,
+    "phrases": PRIORITY_LOW,
+}
+
+
+class TokenBucket:
+    """Client-side requests-per-second limiter with a priority queue.
+
+    Calls take a token immediately while tokens are available; otherwise
+    they wait in a queue ordered by priority. The queue never grows beyond
+    ``max_queue``: when it is full, the least important waiter is evicted
+    with :class:`RateLimitExceeded` to make room for a more important call,
+    otherwise the newcomer itself is rejected. A non-positive ``rate``
+    disables the limiter.
+    """
+
+    def __init__(
+        self, rate: float, burst: float, max_queue: int, clock=time.monotonic
+    ) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_queue = max_queue
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _remove(self, entry: tuple[int, int, asyncio.Future]) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        self._refill()
+        while self._waiters and self._tokens >= 1:
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self._tokens -= 1
+            fut.set_result(None)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._waiters and self._timer is None:
+            delay = max((1 - self._tokens) / self.rate, 0.0)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL) -> None:
+        """Wait for a token according to ``priority``."""
+        if self.rate <= 0:
+            return
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            worst = max(self._waiters, default=None)
+            metrics.incr("gpt.rate_dropped")
+            if worst is None or worst[0] <= priority:
+                raise RateLimitExceeded("YandexGPT request queue is full")
+            self._remove(worst)
+            if not worst[2].done():
+                worst[2].set_exception(
+                    RateLimitExceeded("evicted by a higher priority call")
+                )
+        entry = (priority, next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        metrics.incr("gpt.rate_queued")
+        self._schedule()
+        try:
+            await entry[2]
+        except asyncio.CancelledError:
+            self._remove(entry)
+            raise
+
+
+limiter = TokenBucket(GPT_RATE_LIMIT, GPT_RATE_BURST or GPT_RATE_LIMIT, GPT_QUEUE_SIZE)
+
+
+class Permit:
+    """Permission for one call; ``probe`` is the half-open round or 0."""
+
+    __slots__ = ("probe",)
+
+    def __init__(self, probe: int = 0) -> None:
+        self.probe = probe
+
+
+class CircuitBreaker:
+    """Stops calling YandexGPT after repeated failures or slow responses.
+
+    After ``failure_threshold`` consecutive failed (or slower than
+    ``slow_call``) calls the circuit opens and every call is rejected for
+    ``cooldown`` seconds. Then up to ``probes`` calls are let through
+    (half-open); if they all succeed the circuit closes, any failure opens
+    it again. :meth:`allow` returns a :class:`Permit` that the caller
+    passes back with the outcome, so that only the probes of the current
+    half-open round decide the state; calls admitted earlier and finishing
+    late are ignored while the circuit is half-open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        slow_call: float,
+        cooldown: float,
+        probes: int,
+        clock=time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.slow_call = slow_call
+        self.cooldown = cooldown
+        self.probes = probes
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._round = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    @property
+    def state(self) -> str:
+        elapsed = self._clock() - self._opened_at
+        if self._state == self.OPEN and elapsed >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._round += 1
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        return self._state
+
+    def allow(self) -> Optional[Permit]:
+        """Return a permit if a call may be made now, otherwise ``None``."""
+        state = self.state
+        if state == self.CLOSED:
+            return Permit()
+        if state == self.HALF_OPEN and self._probes_in_flight < self.probes:
+            self._probes_in_flight += 1
+            return Permit(self._round)
+        return None
+
+    def _is_probe(self, permit: Optional[Permit]) -> bool:
+        """Return ``True`` for a probe of the current half-open round."""
+        return (
+            permit is not None
+            and permit.probe == self._round
+            and permit.probe > 0
+            and self._state == self.HALF_OPEN
+        )
+
+    def record_success(self, elapsed: float, permit: Optional[Permit] = None) -> None:
+        if elapsed >= self.slow_call:
+            self.record_failure(permit)
+            return
+        if self._is_probe(permit):
+            self._probes_in_flight -= 1
+            self._probe_successes += 1
+            if self._probe_successes >= self.probes:
+                self._state = self.CLOSED
+                self._failures = 0
+                logging.info("YandexGPT circuit closed")
+        elif self._state == self.CLOSED:
+            self._failures = 0
+
+    def record_failure(self, permit: Optional[Permit] = None) -> None:
+        probe = self._is_probe(permit)
+        if self._state == self.HALF_OPEN and not probe:
+            return
+        self._failures += 1
+        if probe or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                metrics.incr("gpt.circuit_opened")
+                logging.warning(
+                    "YandexGPT circuit opened after %s failures", self._failures
+                )
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+
+    def record_cancelled(self, elapsed: float, permit: Optional[Permit] = None) -> None:
+        """Account a cancelled call, e.g. one cut off by the update budget.
+
+        The budget belongs to one user's update, so cancellation alone says
+        nothing about API health; only calls already slower than
+        ``slow_call`` count as failures.
+        """
+        if elapsed >= self.slow_call:
+            self.record_failure(permit)
+        else:
+            self.release(permit)
+
+    def release(self, permit: Optional[Permit] = None) -> None:
+        """Forget a call that ended without a verdict (e.g. a client error)."""
+        if self._is_probe(permit):
+            self._probes_in_flight -= 1
+
+    def reset(self) -> None:
+        """Close the circuit and forget collected failures."""
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return breaker state for monitoring."""
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "opened_at": self._opened_at if self._state != self.CLOSED else None,
+        }
+
+
+breaker = CircuitBreaker(
+    failure_threshold=GPT_BREAKER_FAILURES,
+    slow_call=GPT_BREAKER_SLOW_CALL,
+    cooldown=GPT_BREAKER_COOLDOWN,
+    probes=GPT_BREAKER_PROBES,
+)
+
+
+class _Flight:
+    """Shared upstream call and the number of callers awaiting it."""
+
+    def __init__(self, task: "asyncio.Task[str]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+# In-flight generate_text calls keyed by prompt and call profile, so
+# concurrent callers with the same request share one upstream call.
+_inflight: dict[tuple[str, CallProfile], _Flight] = {}
+
+# Loop time by which the current update must be answered. Set per handler
+# task by :func:`update_budget`; ``None`` means no deadline.
+_deadline: ContextVar[Optional[float]] = ContextVar("gpt_deadline", default=None)
+
+
+@contextmanager
+def update_budget(seconds: float) -> Iterator[None]:
+    """Limit GPT-backed steps inside the block to ``seconds`` in total.
+
+    A non-positive value disables the limit.
+    """
+    deadline = asyncio.get_running_loop().time() + seconds if seconds > 0 else None
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Return seconds left in the current update budget or ``None``."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - asyncio.get_running_loop().time(), 0.0)
+
+
+async def within_budget(aw: Awaitable[T], fallback: T) -> T:
+    """Await ``aw`` within the remaining update budget.
+
+    Returns ``fallback`` if the budget runs out first; the late call is
+    cancelled so it does not keep running in the background.
+    """
+    remaining = remaining_budget()
+    if remaining is None:
+        return await aw
+    if remaining <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        metrics.incr("budget.exhausted")
+        return fallback
+    try:
+        return await asyncio.wait_for(aw, remaining)
+    except asyncio.TimeoutError:
+        metrics.incr("budget.timeout")
+        return fallback
+
 
 def create_session() -> aiohttp.ClientSession:
     """Return aiohttp session configured with shared SSL context."""
-    connector = aiohttp.TCPConnector(ssl=SSL_CONTEXT)
+    connector = aiohttp.TCPConnector(
+        ssl=SSL_CONTEXT,
+        limit=GPT_POOL_LIMIT,
+        limit_per_host=GPT_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=GPT_DNS_CACHE_TTL,
+        keepalive_timeout=GPT_KEEPALIVE_TIMEOUT,
+    )
     return aiohttp.ClientSession(connector=connector)
 
 
-async def generate_text(
-    prompt: str,
-    *,
-    temperature: float = 0.5,
-    max_tokens: int = 100,
-    timeout: int = 15,
-) -> str:
-    """Call YandexGPT and return the generated text."""
-    headers = {
-        "Authorization": f"Bearer {YANDEX_IAM_TOKEN}",
-        "Content-Type": "application/json",
-    }
+def _discard_session(
+    session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]
+) -> None:
+    """Release a session that belongs to another event loop."""
+    if session.closed:
+        return
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+        return
+    # Цикл уже остановлен, и его соединения не закрыть; отсоединяем
+    # коннектор, чтобы сессия считалась закрытой
+    session.detach()
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the shared session, creating it on first use.
+
+    A session left over from another event loop is released first.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is not None and _session_loop is not loop:
+        _discard_session(_session, _session_loop)
+        _session = None
+    if _session is None or _session.closed:
+        _session = create_session()
+        _session_loop = loop
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared session and release pooled connections."""
+    global _session, _session_loop
+    session, _session, _session_loop = _session, None, None
+    if session is not None and not session.closed:
+        await session.close()
+
+
+# HTTP statuses worth another attempt: throttling and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Return delay requested by the ``Retry-After`` header, if any."""
+    if not isinstance(error, aiohttp.ClientResponseError) or not error.headers:
+        return None
+    value = error.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRYABLE_STATUSES
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
+def _retry_delay(error: BaseException, attempt: int) -> float:
+    """Return exponential backoff with full jitter or the server's request."""
+    requested = _retry_after(error)
+    if requested is not None:
+        return requested
+    ceiling = min(GPT_RETRY_MAX_DELAY, GPT_RETRY_BASE_DELAY * 2**attempt)
+    return random.uniform(0, ceiling)
+
+
+def _build_payload(
+    messages: list[dict[str, str]],
+    profile: CallProfile,
+    stream: bool = False,
+    schema: Optional[dict[str, Any]] = None,
+) -> dict[str, Any]:
     payload: dict[str, Any] = {
-        "modelUri": MODEL_URI,
+        "modelUri": profile.model_uri,
         "completionOptions": {
-            "stream": False,
-            "temperature": temperature,
-            "maxTokens": max_tokens,
+            "stream": stream,
+            "temperature": profile.temperature,
+            "maxTokens": profile.max_tokens,
         },
-        "messages": [{"role": "user", "text": prompt}],
+        "messages": messages,
     }
+    if schema is not None:
+        payload["jsonSchema"] = {"schema": schema}
+    return payload
+
+
+def _answer_text(data: dict[str, Any]) -> str:
+    """Return text of the first alternative from a completion response."""
+    return (
+        data.get("result", {})
+        .get("alternatives", [{}])[0]
+        .get("message", {})
+        .get("text", "")
+    )
+
+
+async def _admit(priority: int) -> Permit:
+    """Return a breaker permit, then wait for a limiter token.
+
+    The breaker is asked first so that an open circuit falls back at once
+    instead of queueing for a token it would only waste.
+    """
+    permit = breaker.allow()
+    if permit is None:
+        metrics.incr("gpt.circuit_rejected")
+        raise CircuitOpenError("YandexGPT circuit is open")
+    try:
+        await limiter.acquire(priority)
+    except BaseException:
+        breaker.release(permit)
+        raise
+    return permit
+
+
+async def _post_completion(
+    payload: dict[str, Any], timeout: float, permit: Permit
+) -> dict[str, Any]:
+    """Make one HTTP attempt and report its outcome to the circuit breaker."""
+    headers = {
+        "Authorization": f"Bearer {YANDEX_IAM_TOKEN}",
+        "Content-Type": "application/json",
+    }
+    started = time.monotonic()
+    try:
+        session = get_session()
+        async with session.post(
+            API_URL,
+            headers=headers,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+    except aiohttp.ClientResponseError as e:
+        # Client errors other than throttling say nothing about API health
+        if e.status == 429 or e.status >= 500:
+            breaker.record_failure(permit)
+        else:
+            breaker.release(permit)
+        raise
+    except (asyncio.TimeoutError, aiohttp.ClientError):
+        breaker.record_failure(permit)
+        raise
+    except asyncio.CancelledError:
+        breaker.record_cancelled(time.monotonic() - started, permit)
+        raise
+    except BaseException:
+        breaker.release(permit)
+        raise
+    breaker.record_success(time.monotonic() - started, permit)
+    return data
+
+
+async def _complete(
+    payload: dict[str, Any], profile: CallProfile, call_type: str
+) -> dict[str, Any]:
+    """Run the limiter/breaker/retry loop and return the response body."""
+    priority = CALL_PRIORITIES.get(call_type, PRIORITY_NORMAL)
+    attempt = 0
+    while True:
+        permit = await _admit(priority)
+        try:
+            return await _post_completion(payload, profile.timeout, permit)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            attempt += 1
+            if attempt >= GPT_RETRY_ATTEMPTS or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt - 1)
+            remaining = remaining_budget()
+            if delay > GPT_RETRY_MAX_DELAY or (
+                remaining is not None and delay >= remaining
+            ):
+                raise
+            metrics.incr(f"gpt.retries.{call_type}")
+            logging.info(
+                "Retrying %s request in %.2fs after %r", call_type, delay, e
+            )
+            await asyncio.sleep(delay)
+
+
+def _usage(data: dict[str, Any]) -> tuple[int, int]:
+    """Return ``(input, output)`` token counts from a completion response."""
+    usage = data.get("result", {}).get("usage") or {}
     try:
-        async with create_session() as session:
+        return (
+            int(usage.get("inputTextTokens", 0)),
+            int(usage.get("completionTokens", 0)),
+        )
+    except (TypeError, ValueError):
+        return 0, 0
+
+
+@contextmanager
+def _accounting(call_type: str) -> Iterator[dict[str, Any]]:
+    """Record outcome, wall time and token usage of one model call.
+
+    The caller stores the last response body under ``"data"``; calls that
+    end with :class:`GPTUnavailableError` or cancellation by the update
+    budget are accounted as ``fallback``.
+    """
+    started = time.monotonic()
+    record: dict[str, Any] = {"data": {}}
+    outcome = "fallback"
+    try:
+        yield record
+        outcome = "ok"
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise
+    except aiohttp.ClientError:
+        outcome = "http_error"
+        raise
+    finally:
+        metrics.record_call(
+            call_type,
+            outcome,
+            time.monotonic() - started,
+            *_usage(record["data"]),
+        )
+
+
+async def request_completion(
+    messages: list[dict[str, str]],
+    *,
+    call_type: str,
+    schema: Optional[dict[str, Any]] = None,
+) -> str:
+    """Send completion request through the shared session and return text.
+
+    Network and HTTP errors are propagated to the caller so that each entry
+    point can choose its own fallback. :class:`GPTUnavailableError` is raised
+    without touching the network while the circuit breaker is open or when
+    the rate limiter drops the call. ``call_type`` selects the priority and
+    the completion profile (model, tokens, temperature, timeout).
+
+    Timeouts, connection errors, 429 and 5xx responses are retried up to
+    ``GPT_RETRY_ATTEMPTS`` times with jittered exponential backoff (or the
+    delay from ``Retry-After``), but only while the pause fits into the
+    remaining update budget.
+
+    With ``schema`` the model is asked for structured output: the answer is
+    a JSON document matching the given JSON schema.
+
+    Every call is accounted in :mod:`metrics` under ``call_type``.
+    """
+    profile = get_profile(call_type)
+    payload = _build_payload(messages, profile, schema=schema)
+    with _accounting(call_type) as record:
+        record["data"] = await _complete(payload, profile, call_type)
+    return _answer_text(record["data"])
+
+
+async def stream_completion(
+    messages: list[dict[str, str]], *, call_type: str
+) -> AsyncIterator[str]:
+    """Yield the growing completion text while YandexGPT streams it.
+
+    The API sends one JSON object per line, each with the whole text
+    generated so far. Errors are propagated like in
+    :func:`request_completion`, but a started stream is never retried.
+    """
+    with _accounting(call_type) as record:
+        permit = await _admit(CALL_PRIORITIES.get(call_type, PRIORITY_NORMAL))
+        headers = {
+            "Authorization": f"Bearer {YANDEX_IAM_TOKEN}",
+            "Content-Type": "application/json",
+        }
+        profile = get_profile(call_type)
+        payload = _build_payload(messages, profile, stream=True)
+        started = time.monotonic()
+        try:
+            session = get_session()
             async with session.post(
-                API_URL, headers=headers, json=payload, timeout=timeout
+                API_URL,
+                headers=headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=profile.timeout),
             ) as response:
                 response.raise_for_status()
-                data = await response.json()
-                return (
-                    data.get("result", {})
-                    .get("alternatives", [{}])[0]
-                    .get("message", {})
-                    .get("text", "")
-                    .strip()
-                )
+                last = ""
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record["data"] = json.loads(line)
+                    text = _answer_text(record["data"])
+                    # Модель может повторить тот же накопленный текст
+                    if text and text != last:
+                        last = text
+                        yield text
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429 or e.status >= 500:
+                breaker.record_failure(permit)
+            else:
+                breaker.release(permit)
+            raise
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            breaker.record_failure(permit)
+            raise
+        except asyncio.CancelledError:
+            breaker.record_cancelled(time.monotonic() - started, permit)
+            raise
+        except BaseException:
+            breaker.release(permit)
+            raise
+        breaker.record_success(time.monotonic() - started, permit)
+
+
+async def _generate_text(prompt: str, call_type: str) -> str:
+    try:
+        text = await request_completion(
+            [{"role": "user", "text": prompt}], call_type=call_type
+        )
+        return text.strip()
+    except GPTUnavailableError as e:
+        logging.info("Skipping text generation: %s", e)
     except (asyncio.TimeoutError, aiohttp.ClientError) as e:
         logging.exception("Failed to generate text: %s", e)
     except Exception as e:  # pragma: no cover - unexpected
@@ -64,6 +717,58 @@ async def generate_text(
     return ""
 
 
-def build_prompt(extra: str) -> str:
-    """Attach shared header to task-specific part."""
-    return f"{BASE_PROMPT} {extra}".strip()
+async def generate_text(
+    prompt: str,
+    *,
+    call_type: str = "text",
+    coalesce: bool = True,
+) -> str:
+    """Call YandexGPT with the ``call_type`` profile and return the text.
+
+    Identical concurrent requests are merged into a single upstream call
+    unless ``coalesce`` is false (e.g. when several variants are wanted).
+    """
+    if not coalesce:
+        return await _generate_text(prompt, call_type)
+
+    key = (prompt, get_profile(call_type))
+    loop = asyncio.get_running_loop()
+    flight = _inflight.get(key)
+    if flight is not None and flight.task.get_loop() is loop:
+        metrics.incr("gpt.coalesced")
+    else:
+        task = loop.create_task(
+            _generate_text(prompt, call_type)
+        )
+        flight = _inflight[key] = _Flight(task)
+
+        def _forget(done: "asyncio.Task[str]") -> None:
+            current = _inflight.get(key)
+            if current is not None and current.task is done:
+                del _inflight[key]
+
+        task.add_done_callback(_forget)
+    # Shield the shared task so that one cancelled caller does not cancel it
+    # for the others; it is cancelled only when nobody is waiting any more.
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    except asyncio.CancelledError:
+        if flight.waiters == 1:
+            flight.task.cancel()
+        raise
+    finally:
+        flight.waiters -= 1
+
+
+async def stream_text(prompt: str, *, call_type: str = "text") -> AsyncIterator[str]:
+    """Stream YandexGPT answer for ``prompt``; yields nothing on failure."""
+    try:
+        async for text in stream_completion(
+            [{"role": "user", "text": prompt}], call_type=call_type
+        ):
+            yield text.strip()
+    except GPTUnavailableError as e:
+        logging.info("Skipping text streaming: %s", e)
+    except (asyncio.TimeoutError, aiohttp.ClientError, ValueError) as e:
+        logging.exception("Failed to stream text: %s", e)
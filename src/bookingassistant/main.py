@@ -3,14 +3,25 @@
 import asyncio
 import json
 import logging
+import signal
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Optional
 
 from aiogram import Bot, Dispatcher, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from .config import TELEGRAM_BOT_TOKEN, MANAGER_BOT_TOKEN, MANAGER_CHAT_ID
+from .config import (
+    TELEGRAM_BOT_TOKEN,
+    MANAGER_BOT_TOKEN,
+    MANAGER_CHAT_ID,
+    COMBINED_PARSING,
+    PHRASE_POOL_SIZE,
+    PHRASE_POOL_REFRESH,
+    UPDATE_BUDGET,
+    STREAM_EDIT_INTERVAL,
+)
 from .texts import (
     DEFAULT_QUESTIONS,
     EXTRA_QUESTIONS,
@@ -31,20 +42,34 @@ from .texts import (
 )
 from .parser import (
     parse_history_request,
+    parse_message,
+    booking_flow_active,
+    needs_history_parsing,
+    needs_intent_parsing,
     generate_question,
     generate_confirmation,
     generate_fallback,
     parse_yes_no,
+    stream_confirmation,
+    stream_fallback,
 )
 from .atlas import build_routes_url, link_has_routes
+from .gpt import close_session, update_budget, within_budget
+from .profiles import get_profile
+from .phrases import phrase_pool
+from .prompts import prompt_cache
+from . import metrics
 
 from .slot_editor import update_slots
 from .utils import display_transport, normalize_time
 from .storage import save_trip, get_last_trips, cancel_trip
 from .state_storage import (
-    get_user_state,
-    set_user_state,
-    clear_user_state,
+    STATE_SWEEP_INTERVAL,
+    STATE_TTL,
+    UserState,
+    close as close_state_storage,
+    flush as flush_states,
+    run_sweeper,
     StateStorageError,
 )
 
@@ -58,15 +83,57 @@ manager_bot = Bot(token=MANAGER_BOT_TOKEN) if MANAGER_BOT_TOKEN else None
 # Последнее время активности пользователя
 last_seen: Dict[int, datetime] = {}
 
+# Фоновые задачи, запущенные на время работы бота
+background_tasks: set[asyncio.Task] = set()
+
 
 # Слоты, необходимые для первоначального запроса
 REQUIRED_SLOTS = ["origin", "destination", "date", "transport"]
 
 
+@dp.message.outer_middleware()
+async def budget_middleware(handler, event, data):
+    """Ограничить время ожидания модели при обработке одного сообщения."""
+    with update_budget(UPDATE_BUDGET):
+        return await handler(event, data)
+
+
+@dp.message.middleware()
+async def state_middleware(handler, event, data):
+    """Загрузить состояние пользователя один раз и записать его после обработки.
+
+    Обработчик получает изменяемый :class:`UserState` в аргументе
+    ``user_state``; изменения записываются одним вызовом в конце, даже
+    если обработчик завершился ошибкой (например, при отправке ответа).
+    """
+    try:
+        state = await UserState.load(event.from_user.id)
+    except StateStorageError as e:
+        logger.exception("Failed to load state: %s", e)
+        await event.answer(SERVICE_ERROR_MESSAGE)
+        return None
+    data["user_state"] = state
+    try:
+        return await handler(event, data)
+    finally:
+        try:
+            if await state.commit():
+                await flush_states()
+        except StateStorageError as e:
+            logger.exception("Failed to save state: %s", e)
+
+
 def get_missing_slots(slots: Dict[str, Optional[str]]):
     return [key for key in REQUIRED_SLOTS if not slots.get(key)]
 
 
+def extract_slots(parsed: Optional[Dict[str, Optional[str]]]):
+    """Return only trip slots from combined intent result or ``None``."""
+    if parsed is None:
+        return None
+    return {key: parsed.get(key) for key in REQUIRED_SLOTS}
+
+
 async def notify_manager(
     trip_id: int, slots: Dict[str, Optional[str]], user: types.User
 ):
@@ -92,6 +159,63 @@ async def greet_if_needed(message: Message):
     last_seen[uid] = now
 
 
+async def answer_streamed(
+    message: Message, chunks: AsyncIterator[str], fallback: str, prefix: str = ""
+) -> None:
+    """Отправить ответ модели по мере генерации.
+
+    Первый фрагмент отправляется отдельным сообщением в пределах бюджета
+    времени, дальше сообщение редактируется не чаще ``STREAM_EDIT_INTERVAL``.
+    Если модель не успела ответить, отправляется ``fallback``.
+    """
+    first = await within_budget(anext(chunks, None), None)
+    if not first:
+        await chunks.aclose()
+        await message.answer(prefix + fallback)
+        return
+    sent = await message.answer(prefix + first)
+    shown = latest = first
+    loop = asyncio.get_running_loop()
+    last_edit = loop.time()
+    async for latest in chunks:
+        if latest != shown and loop.time() - last_edit >= STREAM_EDIT_INTERVAL:
+            await _edit_streamed(sent, prefix + latest)
+            shown, last_edit = latest, loop.time()
+    if latest != shown:
+        await _edit_streamed(sent, prefix + latest)
+
+
+async def _edit_streamed(sent: Message, text: str) -> None:
+    # Telegram отвечает 400 "message is not modified" на повтор того же
+    # текста; потерянная правка не должна обрывать ответ пользователю
+    try:
+        await sent.edit_text(text)
+    except TelegramBadRequest as e:
+        logger.warning("Failed to edit streamed answer: %s", e)
+
+
+async def send_confirmation(
+    message: Message, slots: Dict[str, Optional[str]], prefix: str = ""
+) -> None:
+    fallback = (
+        f"Отлично, вот что получилось: {display_transport(slots['transport'])} "
+        f"{slots['origin']} → {slots['destination']} {slots['date']}. Всё верно?"
+    )
+    if get_profile("confirmation").stream:
+        await answer_streamed(message, stream_confirmation(slots), fallback, prefix)
+        return
+    summary = await generate_confirmation(slots, fallback)
+    await message.answer(prefix + summary)
+
+
+async def send_fallback(message: Message) -> None:
+    if get_profile("fallback").stream:
+        await answer_streamed(message, stream_fallback(message.text), DEFAULT_FALLBACK)
+        return
+    text = await generate_fallback(message.text, DEFAULT_FALLBACK)
+    await message.answer(text)
+
+
 @dp.message(Command("start"))
 async def cmd_start(message: Message):
     await greet_if_needed(message)
@@ -104,41 +228,24 @@ async def cmd_help(message: Message):
 
 
 @dp.message(Command("cancel"))
-async def cmd_cancel(message: Message):
+async def cmd_cancel(message: Message, user_state: UserState):
     await greet_if_needed(message)
-    try:
-        await clear_user_state(message.from_user.id)
-    except StateStorageError as e:
-        logger.exception("Failed to clear state: %s", e)
-        await message.answer(SERVICE_ERROR_MESSAGE)
-        return
+    user_state.clear()
     await message.answer(CANCEL_MESSAGE)
 
 
 async def handle_slots(
-    message: Message, state: Optional[Dict[str, Optional[str]]] = None
+    message: Message,
+    state: UserState,
+    parsed: Optional[Dict[str, Optional[str]]] = None,
 ):
     text = message.text
     uid = message.from_user.id
-    if state is None:
-        try:
-            state = await get_user_state(uid) or {}
-        except StateStorageError as e:
-            logger.exception("Failed to load state: %s", e)
-            await message.answer(SERVICE_ERROR_MESSAGE)
-            return
     question = state.pop("last_question", None)
 
     session_data = {uid: state}
-    slots, changed = await update_slots(uid, text, session_data, question)
+    slots, changed = await update_slots(uid, text, session_data, question, parsed)
 
-    state = session_data[uid] = slots
-    try:
-        await set_user_state(uid, state)
-    except StateStorageError as e:
-        logger.exception("Failed to save state: %s", e)
-        await message.answer(SERVICE_ERROR_MESSAGE)
-        return
     missing = get_missing_slots(slots)
 
     changed_msg = ""
@@ -150,8 +257,7 @@ async def handle_slots(
         changed_msg = "Изменил " + ", ".join(parts) + ".\n"
 
     if not changed and all(not v for v in slots.values()):
-        text = await generate_fallback(message.text, DEFAULT_FALLBACK)
-        await message.answer(text)
+        await send_fallback(message)
         return
 
     if missing:
@@ -159,35 +265,29 @@ async def handle_slots(
             missing[0], DEFAULT_QUESTIONS[missing[0]]
         )
         state["last_question"] = question_text
-        try:
-            await set_user_state(uid, state)
-        except StateStorageError as e:
-            logger.exception("Failed to save state: %s", e)
         await message.answer(changed_msg + question_text)
     else:
-        summary = await generate_confirmation(
-            slots,
-            f"Отлично, вот что получилось: {display_transport(slots['transport'])} {slots['origin']} → {slots['destination']} {slots['date']}. Всё верно?",
-        )
-        await message.answer(changed_msg + summary)
+        await send_confirmation(message, slots, changed_msg)
         state["confirm"] = True
-        try:
-            await set_user_state(uid, state)
-        except StateStorageError as e:
-            logger.exception("Failed to save state: %s", e)
 
 
 @dp.message()
-async def handle_message(message: Message):
+async def handle_message(message: Message, user_state: UserState):
     await greet_if_needed(message)
     uid = message.from_user.id
-    try:
-        state = await get_user_state(uid) or {}
-    except StateStorageError as e:
-        logger.exception("Failed to load state: %s", e)
-        await message.answer(SERVICE_ERROR_MESSAGE)
-        return
-    action = await parse_history_request(message.text)
+    state = user_state
+    parsed = None
+    action: Dict[str, Optional[str]] = {"action": ""}
+    if COMBINED_PARSING:
+        if needs_intent_parsing(message.text, state):
+            intent = await parse_message(message.text, state.get("last_question"))
+            parsed = extract_slots(intent)
+            # Во время бронирования "отмени" относится к черновику, а не к
+            # сохранённым поездкам, как и без совмещённого разбора
+            if not booking_flow_active(state):
+                action = intent
+    elif needs_history_parsing(message.text, state):
+        action = await parse_history_request(message.text)
 
     if action.get("action") == "show":
         limit = int(action.get("limit", 5))
@@ -221,28 +321,16 @@ async def handle_message(message: Message):
         key = questions.pop(0)
         answer = message.text
         if key == "time":
-            parsed = await normalize_time(answer)
-            state[key] = parsed if parsed else answer
+            parsed_time = await normalize_time(answer)
+            state[key] = parsed_time if parsed_time else answer
         else:
             state[key] = answer
-        try:
-            await set_user_state(uid, state)
-        except StateStorageError as e:
-            logger.exception("Failed to save state: %s", e)
-            await message.answer(SERVICE_ERROR_MESSAGE)
-            return
         if questions:
             next_key = questions[0]
             await message.answer(EXTRA_QUESTIONS[next_key])
         else:
             state.pop("extra_questions", None)
             state["await_search"] = True
-            try:
-                await set_user_state(uid, state)
-            except StateStorageError as e:
-                logger.exception("Failed to save state: %s", e)
-                await message.answer(SERVICE_ERROR_MESSAGE)
-                return
             await message.answer(ASK_SEARCH_MESSAGE)
         return
     if state.get("await_search"):
@@ -250,12 +338,7 @@ async def handle_message(message: Message):
         if choice == "yes":
             slots = dict(state)
             slots.pop("await_search", None)
-            try:
-                await clear_user_state(uid)
-            except StateStorageError as e:
-                logger.exception("Failed to clear state: %s", e)
-                await message.answer(SERVICE_ERROR_MESSAGE)
-                return
+            state.clear()
             if slots.get("transport", "").lower() in {"автобус", "bus", "автобусы"}:
                 url = build_routes_url(slots["origin"], slots["destination"], slots["date"])
                 if await link_has_routes(slots["origin"], slots["destination"], slots["date"]):
@@ -279,12 +362,7 @@ async def handle_message(message: Message):
         elif choice == "no":
             slots = dict(state)
             slots.pop("await_search", None)
-            try:
-                await clear_user_state(uid)
-            except StateStorageError as e:
-                logger.exception("Failed to clear state: %s", e)
-                await message.answer(SERVICE_ERROR_MESSAGE)
-                return
+            state.clear()
             trip_id = save_trip(
                 {
                     "user_id": uid,
@@ -305,12 +383,7 @@ async def handle_message(message: Message):
 
     if state.get("confirm"):
         if "отмен" in message.text.lower():
-            try:
-                await clear_user_state(uid)
-            except StateStorageError as e:
-                logger.exception("Failed to clear state: %s", e)
-                await message.answer(SERVICE_ERROR_MESSAGE)
-                return
+            state.clear()
             await message.answer(BOOKING_CANCELLED_MESSAGE)
             return
 
@@ -323,25 +396,17 @@ async def handle_message(message: Message):
                 )
                 state["last_question"] = question_text
                 state.pop("confirm", None)
-                try:
-                    await set_user_state(uid, state)
-                except StateStorageError as e:
-                    logger.exception("Failed to save state: %s", e)
                 await message.answer(question_text)
                 return
             state.pop("confirm", None)
             state["extra_questions"] = list(EXTRA_QUESTIONS.keys())
-            try:
-                await set_user_state(uid, state)
-            except StateStorageError as e:
-                logger.exception("Failed to save state: %s", e)
-                await message.answer(SERVICE_ERROR_MESSAGE)
-                return
             await message.answer(EXTRA_QUESTIONS[state["extra_questions"][0]])
         else:
             state.pop("confirm", None)
             session_data = {uid: state}
-            slots, changed = await update_slots(uid, message.text, session_data)
+            slots, changed = await update_slots(
+                uid, message.text, session_data, parsed=parsed
+            )
             state = session_data[uid]
             changed_msg = ""
             if changed:
@@ -357,28 +422,49 @@ async def handle_message(message: Message):
                     missing[0], DEFAULT_QUESTIONS[missing[0]]
                 )
                 state["last_question"] = question_text
-                try:
-                    await set_user_state(uid, state)
-                except StateStorageError as e:
-                    logger.exception("Failed to save state: %s", e)
                 await message.answer(changed_msg + question_text)
             else:
-                summary = await generate_confirmation(
-            slots,
-            f"Отлично, вот что получилось: {display_transport(slots['transport'])} {slots['origin']} → {slots['destination']} {slots['date']}. Всё верно?",
-        )
-                await message.answer(changed_msg + summary)
+                await send_confirmation(message, slots, changed_msg)
                 state["confirm"] = True
-                try:
-                    await set_user_state(uid, state)
-                except StateStorageError as e:
-                    logger.exception("Failed to save state: %s", e)
         return
 
-    await handle_slots(message, state)
+    await handle_slots(message, state, parsed)
+
+
+def log_metrics() -> None:
+    """Write collected counters and per call type GPT usage to the log."""
+    logger.info("Metrics: %s", metrics.dump())
+
+
+async def on_startup():
+    logger.info("Prompt sizes, tokens: %s", prompt_cache.sizes())
+    if PHRASE_POOL_SIZE:
+        background_tasks.add(asyncio.create_task(phrase_pool.run(PHRASE_POOL_REFRESH)))
+    if STATE_TTL > 0 and STATE_SWEEP_INTERVAL > 0:
+        background_tasks.add(asyncio.create_task(run_sweeper(STATE_SWEEP_INTERVAL)))
+    # ``kill -USR1 <pid>`` dumps the aggregates without restarting the bot
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, log_metrics)
+    except (AttributeError, NotImplementedError):
+        logger.info("SIGUSR1 metrics dump is not supported on this platform")
+
+
+async def on_shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await close_session()
+    try:
+        await close_state_storage()
+    except StateStorageError as e:
+        logger.exception("Failed to save user states on shutdown: %s", e)
+    log_metrics()
 
 
 async def main():
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
     await dp.start_polling(bot)
 
 
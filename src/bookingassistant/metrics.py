@@ -0,0 +1,111 @@
+"""Счётчики внутри процесса для мониторинга работы бота.
+
+Кроме простых счётчиков здесь собирается учёт вызовов YandexGPT: число
+вызовов по исходам, токены из блока ``usage`` и время ответа с
+перцентилями по каждому типу вызова.
+"""
+
+import json
+import math
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict
+
+counters: Counter = Counter()
+
+# Сколько последних замеров времени хранить на тип вызова для перцентилей
+LATENCY_SAMPLES = 1000
+
+
+@dataclass
+class CallStats:
+    """Накопленные данные по одному типу вызова модели."""
+
+    outcomes: Counter = field(default_factory=Counter)
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_time: float = 0.0
+    latencies: Deque[float] = field(
+        default_factory=lambda: deque(maxlen=LATENCY_SAMPLES)
+    )
+
+    @property
+    def calls(self) -> int:
+        return sum(self.outcomes.values())
+
+    def percentile(self, q: float) -> float:
+        """Return ``q``-th percentile of recent latencies (nearest rank)."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = math.ceil(len(ordered) * q / 100)
+        return ordered[max(rank, 1) - 1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "outcomes": dict(self.outcomes),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "avg": round(self.total_time / self.calls, 4) if self.calls else 0.0,
+            "p50": round(self.percentile(50), 4),
+            "p99": round(self.percentile(99), 4),
+        }
+
+
+calls: Dict[str, CallStats] = {}
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Increase counter ``name`` by ``value``."""
+    counters[name] += value
+
+
+def snapshot(prefix: str = "") -> Dict[str, int]:
+    """Return a copy of counters whose names start with ``prefix``."""
+    return {k: v for k, v in counters.items() if k.startswith(prefix)}
+
+
+def record_call(
+    call_type: str,
+    outcome: str,
+    elapsed: float,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+) -> None:
+    """Account one model call.
+
+    ``outcome`` is ``ok``, ``timeout``, ``http_error`` or ``fallback`` (the
+    call was rejected or abandoned and the caller used its fallback).
+    """
+    stats = calls.setdefault(call_type, CallStats())
+    stats.outcomes[outcome] += 1
+    stats.input_tokens += input_tokens
+    stats.output_tokens += output_tokens
+    stats.total_time += elapsed
+    stats.latencies.append(elapsed)
+
+
+def call_report() -> Dict[str, Dict[str, Any]]:
+    """Return per call type aggregates, busiest token consumers first."""
+    ordered = sorted(
+        calls.items(),
+        key=lambda item: item[1].input_tokens + item[1].output_tokens,
+        reverse=True,
+    )
+    return {name: stats.summary() for name, stats in ordered}
+
+
+def dump() -> str:
+    """Return counters and call aggregates as a JSON document."""
+    return json.dumps(
+        {"counters": dict(counters), "calls": call_report()},
+        ensure_ascii=False,
+        indent=2,
+    )
+
+
+def reset() -> None:
+    """Drop all collected values."""
+    counters.clear()
+    calls.clear()
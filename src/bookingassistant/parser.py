@@ -1,92 +1,203 @@
 import json
 import logging
 import re
-from datetime import datetime
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Iterable, Optional
 
 import aiohttp
 import asyncio
 
 from .gpt import (
     API_URL,
-    MODEL_URI,
-    build_prompt,
-    create_session,
+    GPTUnavailableError,
     generate_text,
+    request_completion,
+    stream_text,
+    within_budget,
 )
-from .prompts import (
-    SLOTS_PROMPT_TEMPLATE,
-    COMPLETE_PROMPT_TEMPLATE,
-    QUESTION_PROMPT,
-    CONFIRM_PROMPT,
-    FALLBACK_PROMPT,
-    YESNO_PROMPT,
-    HISTORY_PROMPT,
-)
+from .prompts import prompt_cache
 from .texts import TRANSPORT_QUESTION_FALLBACK
-from .config import YANDEX_IAM_TOKEN
+from .config import PHRASE_POOL_SIZE, STRUCTURED_OUTPUT
+from .phrases import phrase_pool
+from .scanner import scan_message
+from .schemas import (
+    HISTORY_SCHEMA,
+    INTENT_SCHEMA,
+    SLOTS_SCHEMA,
+    HistoryCommand,
+    SchemaError,
+    TripSlots,
+    load_object,
+)
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
-TODAY_DATE = datetime.now().strftime("%Y-%m-%d")
-WEEKDAYS_RU = [
-    "понедельник",
-    "вторник",
-    "среда",
-    "четверг",
-    "пятница",
-    "суббота",
-    "воскресенье",
-]
-TODAY_WEEKDAY = WEEKDAYS_RU[datetime.now().weekday()]
-SLOTS_PROMPT = SLOTS_PROMPT_TEMPLATE.replace("{today_date}", TODAY_DATE).replace(
-    "{today_weekday}", TODAY_WEEKDAY
-)
-COMPLETE_PROMPT = COMPLETE_PROMPT_TEMPLATE.replace("{today_date}", TODAY_DATE).replace(
-    "{today_weekday}", TODAY_WEEKDAY
-)
-
 
 async def generate_question(slot: str, fallback: str) -> str:
-    """Return friendly question for missing slot via YandexGPT."""
-    prompt = build_prompt(QUESTION_PROMPT.format(slot=slot))
-    text = await generate_text(prompt)
+    """Return friendly question for missing slot.
+
+    A pre-generated variant from the phrase pool is used when the pool is
+    enabled; otherwise the question is generated via YandexGPT.
+    """
+    if PHRASE_POOL_SIZE:
+        return phrase_pool.question(slot) or fallback
+    prompt = prompt_cache.get("question").format(slot=slot)
+    text = await within_budget(generate_text(prompt, call_type="question"), "")
     return text or fallback
 
 
 async def generate_confirmation(slots: Dict[str, Optional[str]], fallback: str) -> str:
-    """Return booking confirmation message via YandexGPT."""
-    prompt = build_prompt(
-        CONFIRM_PROMPT.format(
-            origin=slots.get("origin", ""),
-            destination=slots.get("destination", ""),
-            date=slots.get("date", ""),
-            transport=slots.get("transport", ""),
-        )
-    )
-    text = await generate_text(prompt)
+    """Return booking confirmation message from the pool or via YandexGPT."""
+    if PHRASE_POOL_SIZE:
+        return phrase_pool.confirmation(slots) or fallback
+    prompt = _confirmation_prompt(slots)
+    text = await within_budget(generate_text(prompt, call_type="confirmation"), "")
     return text or fallback
 
 
 async def generate_fallback(text: str, fallback: str) -> str:
     """Return friendly fallback message via YandexGPT."""
-    prompt = build_prompt(FALLBACK_PROMPT.format(text=text))
-    result = await generate_text(prompt)
+    prompt = prompt_cache.get("fallback").format(text=text)
+    result = await within_budget(generate_text(prompt, call_type="fallback"), "")
     return result or fallback
 
 
+def _confirmation_prompt(slots: Dict[str, Optional[str]]) -> str:
+    return prompt_cache.get("confirm").format(
+        origin=slots.get("origin", ""),
+        destination=slots.get("destination", ""),
+        date=slots.get("date", ""),
+        transport=slots.get("transport", ""),
+    )
+
+
+async def stream_confirmation(slots: Dict[str, Optional[str]]) -> AsyncIterator[str]:
+    """Yield growing confirmation text; a pooled variant comes in one piece."""
+    if PHRASE_POOL_SIZE:
+        variant = phrase_pool.confirmation(slots)
+        if variant:
+            yield variant
+        return
+    prompt = _confirmation_prompt(slots)
+    async for text in stream_text(prompt, call_type="confirmation"):
+        yield text
+
+
+async def stream_fallback(text: str) -> AsyncIterator[str]:
+    """Yield growing fallback reply generated by YandexGPT."""
+    prompt = prompt_cache.get("fallback").format(text=text)
+    async for chunk in stream_text(prompt, call_type="fallback"):
+        yield chunk
+
+
 def parse_transport(text: str) -> Optional[str]:
     """Return normalized transport type from free-form text or ``None``."""
-    text = text.lower()
-    if re.search(r"\b(автобус|маршрутк|atlas|шкипер|bus|бус|бас)\w*", text):
-        return "bus"
-    if re.search(
-        r"\b(самол[eё]т|самолетик|птичк|авиабилет|plane|полететь|лететь)\w*", text
-    ):
-        return "plane"
-    if re.search(r"\b(поезд|электричк|ржд|сапсан|train|ж.?д)\w*", text):
-        return "train"
-    return None
+    return scan_message(text).transport
+
+
+_JSON_DECODER = json.JSONDecoder()
+# Only "{" followed by a key or "}" can start an object; skipping other
+# braces avoids costly decode errors on garbage like "{{{{".
+_OBJECT_START_RE = re.compile(r'\{\s*["}]')
+# Inside an object: nested object starts, closing braces and string
+# literals (JSON strings cannot span lines, so a stray quote ends there)
+_OBJECT_TOKEN_RE = re.compile(r'\{(?=\s*["}])|\}|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?')
+_CODE_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+
+
+def _object_spans(text: str, pos: int) -> tuple[list[int], dict[int, int]]:
+    """Return possible object starts from ``pos`` and the end of closed ones.
+
+    A single scan that skips string literals pairs every ``{`` with its
+    ``}``; starts that are never closed get no end.
+    """
+    starts: list[int] = []
+    ends: dict[int, int] = {}
+    stack: list[int] = []
+    match = _OBJECT_START_RE.search(text, pos)
+    while match:
+        starts.append(match.start())
+        stack.append(match.start())
+        for token in _OBJECT_TOKEN_RE.finditer(text, match.start() + 1):
+            char = token.group()[0]
+            if char == "{":
+                starts.append(token.start())
+                stack.append(token.start())
+            elif char == "}":
+                ends[stack.pop()] = token.end()
+                if not stack:
+                    break
+        else:
+            break
+        match = _OBJECT_START_RE.search(text, token.end())
+    return starts, ends
+
+
+def _keep(result, obj, start: int, end: int):
+    # Objects with a non-empty key win over "{}" and '{"": 1}'
+    if isinstance(obj, dict) and (any(obj) or result is None):
+        return obj, start, end
+    return result
+
+
+def _find_json_balanced(
+    text: str, pos: int, failed_at: int, result
+) -> Optional[tuple[dict, int, int]]:
+    """Continue :func:`_find_json` from ``pos`` over balanced spans only.
+
+    Unclosed starts are never decoded. After a failure at ``failed_at``
+    the spans containing it are skipped because they would fail at the
+    same place, while objects closed before it are still decoded.
+    """
+    starts, ends = _object_spans(text, pos)
+    resume = pos
+    for start in starts:
+        end = ends.get(start)
+        if end is None or start < resume or start < failed_at < end:
+            continue
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, start)
+        except json.JSONDecodeError as e:
+            failed_at = e.pos
+            continue
+        except RecursionError:
+            # Too deep to decode; nested spans are just as deep
+            resume = end
+            continue
+        result = _keep(result, obj, start, end)
+        resume = end
+    return result
+
+
+def _find_json(text: str) -> Optional[tuple[dict, int, int]]:
+    """Return the last JSON object in ``text`` with its start and end offsets.
+
+    Objects are decoded with ``JSONDecoder.raw_decode`` one after another,
+    continuing behind each decoded object. After the first failed decode
+    the rest of the text is handed to :func:`_find_json_balanced`, so
+    garbage such as unclosed or deeply nested braces costs linear time
+    instead of a decode attempt from every later ``{``.
+    """
+    result = None
+    match = _OBJECT_START_RE.search(text)
+    while match:
+        start = match.start()
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, start)
+        except json.JSONDecodeError as e:
+            return _find_json_balanced(text, start, e.pos, result)
+        except RecursionError:
+            return _find_json_balanced(text, start, -1, result)
+        result = _keep(result, obj, start, end)
+        match = _OBJECT_START_RE.search(text, end)
+    return result
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if "```" in text:
+        text = _CODE_FENCE_RE.sub("", text).strip()
+    return text
 
 
 def _extract_json(text: str) -> str:
@@ -97,36 +208,25 @@ def _extract_json(text: str) -> str:
     ``JSONDecodeError: Extra data``. This helper extracts the last
     decodable JSON object so the caller can safely parse it.
     """
-    text = text.strip()
-    if text.startswith("```"):
-        # Strip code fences like ```json
-        text = text.strip("`")
-        text = text.lstrip("json").strip()
-
-    # Iterate over potential JSON objects and return the last valid one
-    start = None
-    depth = 0
-    result = None
-    for idx, char in enumerate(text):
-        if char == "{":
-            if depth == 0:
-                start = idx
-            depth += 1
-        elif char == "}":
-            if depth == 0:
-                continue
-            depth -= 1
-            if depth == 0 and start is not None:
-                candidate = text[start : idx + 1]
-                try:
-                    obj = json.loads(candidate)
-                    if isinstance(obj, dict):
-                        if any(k for k in obj.keys()) or result is None:
-                            result = candidate
-                except json.JSONDecodeError:
-                    pass
-                start = None
-    return result or text
+    found = _find_json(text)
+    if found is None:
+        return _strip_fences(text)
+    _, start, end = found
+    return text[start:end]
+
+
+def _parse_json(text: str):
+    """Return the last JSON object from ``text`` without parsing it twice."""
+    found = _find_json(text)
+    if found is None:
+        return json.loads(_strip_fences(text))
+    return found[0]
+
+
+def _malformed(call_type: str, answer: str, error: Exception) -> None:
+    """Count and log a model answer that could not be used."""
+    metrics.incr(f"gpt.malformed.{call_type}")
+    logger.warning("Malformed %s answer %r: %s", call_type, answer, error)
 
 
 def _safe_int(value, default: int = 0) -> int:
@@ -141,49 +241,45 @@ def _safe_int(value, default: int = 0) -> int:
 
 
 async def parse_slots(
-    text: str, question: Optional[str] = None
+    text: str,
+    question: Optional[str] = None,
+    wanted: Optional[Iterable[str]] = None,
 ) -> Dict[str, Optional[str]]:
-    """Отправляет текст (и контекст вопроса) в YandexGPT и возвращает словарь слотов."""
+    """Отправляет текст (и контекст вопроса) в YandexGPT и возвращает словарь слотов.
+
+    ``wanted`` ограничивает запрос слотами, которые не удалось определить
+    локально; остальные модель оставляет пустыми.
+    """
     if question:
         text = f"Вопрос: {question}\nОтвет: {text}"
+    if wanted:
+        text = f"{text}\nОпредели только: {', '.join(wanted)}"
     logger.info("User message: %s", text)
-    headers = {
-        "Authorization": f"Bearer {YANDEX_IAM_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "modelUri": MODEL_URI,
-        "completionOptions": {
-            "stream": False,
-            "temperature": 0.2,
-            "maxTokens": 2000,
-        },
-        "messages": [
-            {"role": "system", "text": build_prompt(SLOTS_PROMPT)},
-            {"role": "user", "text": text},
-        ],
-    }
+    messages = [
+        {"role": "system", "text": prompt_cache.get("slots")},
+        {"role": "user", "text": text},
+    ]
+    answer = ""
     try:
-        async with create_session() as session:
-            async with session.post(
-                API_URL, headers=headers, json=payload, timeout=30
-            ) as response:
-                response.raise_for_status()
-                data = await response.json()
-                answer = (
-                    data.get("result", {})
-                    .get("alternatives", [{}])[0]
-                    .get("message", {})
-                    .get("text", "")
-                )
-                logger.info("Yandex response: %s", answer)
-                slots = json.loads(_extract_json(answer))
-                return {
-                    "origin": slots.get("origin"),
-                    "destination": slots.get("destination"),
-                    "date": slots.get("date"),
-                    "transport": slots.get("transport"),
-                }
+        if STRUCTURED_OUTPUT:
+            answer = await request_completion(
+                messages, call_type="slots", schema=SLOTS_SCHEMA
+            )
+            logger.info("Yandex response: %s", answer)
+            return TripSlots.from_dict(load_object(answer)).as_dict()
+        answer = await request_completion(messages, call_type="slots")
+        logger.info("Yandex response: %s", answer)
+        slots = _parse_json(answer)
+        return {
+            "origin": slots.get("origin"),
+            "destination": slots.get("destination"),
+            "date": slots.get("date"),
+            "transport": slots.get("transport"),
+        }
+    except GPTUnavailableError as e:
+        logger.info("Skipping slot parsing: %s", e)
+    except (json.JSONDecodeError, SchemaError) as e:
+        _malformed("slots", answer, e)
     except (asyncio.TimeoutError, aiohttp.ClientError) as e:
         logger.exception("Failed to parse slots: %s", e)
     except Exception as e:
@@ -210,54 +306,41 @@ async def complete_slots(
         logger.info("No missing slots, skipping completion API call")
         return slots, None
 
-    headers = {
-        "Authorization": f"Bearer {YANDEX_IAM_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "modelUri": MODEL_URI,
-        "completionOptions": {
-            "stream": False,
-            "temperature": 0.2,
-            "maxTokens": 2000,
+    messages = [
+        {"role": "system", "text": prompt_cache.get("complete")},
+        {
+            "role": "user",
+            "text": json.dumps({k: slots.get(k) for k in missing}, ensure_ascii=False),
         },
-        "messages": [
-            {"role": "system", "text": build_prompt(COMPLETE_PROMPT)},
-            {
-                "role": "user",
-                "text": json.dumps(
-                    {k: slots.get(k) for k in missing}, ensure_ascii=False
-                ),
-            },
-        ],
-    }
+    ]
     question: Optional[str] = None
     result = slots
+    answer = ""
     try:
-        async with create_session() as session:
-            async with session.post(
-                API_URL, headers=headers, json=payload, timeout=30
-            ) as response:
-                response.raise_for_status()
-                data = await response.json()
-                answer = (
-                    data.get("result", {})
-                    .get("alternatives", [{}])[0]
-                    .get("message", {})
-                    .get("text", "")
-                )
-                logger.info("Yandex completion: %s", answer)
-                updated = json.loads(_extract_json(answer))
-
-                mapping = {
-                    "origin": updated.get("origin"),
-                    "destination": updated.get("destination"),
-                    "date": updated.get("date"),
-                    "transport": updated.get("transport"),
-                }
-                for key in missing:
-                    if mapping.get(key):
-                        result[key] = mapping[key]
+        if STRUCTURED_OUTPUT:
+            answer = await request_completion(
+                messages, call_type="complete", schema=SLOTS_SCHEMA
+            )
+            logger.info("Yandex completion: %s", answer)
+            mapping = TripSlots.from_dict(load_object(answer)).as_dict()
+        else:
+            answer = await request_completion(messages, call_type="complete")
+            logger.info("Yandex completion: %s", answer)
+            updated = _parse_json(answer)
+
+            mapping = {
+                "origin": updated.get("origin"),
+                "destination": updated.get("destination"),
+                "date": updated.get("date"),
+                "transport": updated.get("transport"),
+            }
+        for key in missing:
+            if mapping.get(key):
+                result[key] = mapping[key]
+    except GPTUnavailableError as e:
+        logger.info("Skipping slot completion: %s", e)
+    except (json.JSONDecodeError, SchemaError) as e:
+        _malformed("complete", answer, e)
     except (asyncio.TimeoutError, aiohttp.ClientError) as e:
         logger.exception("Failed to complete slots: %s", e)
     except Exception as e:
@@ -289,49 +372,92 @@ def _heuristic_history(text: str) -> Dict[str, Optional[str]]:
     return {"action": ""}
 
 
+# Ключи состояния, при которых пользователь отвечает на вопросы бота
+BOOKING_FLOW_KEYS = ("extra_questions", "await_search", "confirm", "last_question")
+# Команды, которые сами по себе говорят о работе с историей поездок
+HISTORY_STEMS = (
+    "истори",
+    "покаж",
+    "показ",
+    "отмен",
+)
+# Слова "поездка", "бронь", "заявка" встречаются и в новых заказах
+# ("хочу поездку в Казань", "забронировать билет"), поэтому относятся к
+# истории только рядом с притяжательным словом или словом о прошлом
+HISTORY_NOUNS = (r"поезд(?:к|ок)\w*", r"брон(?:ь|и|ей|ям|ями|ях)", r"заяв(?:к|ок)\w*")
+HISTORY_CUES = (
+    r"мо(?:й|я|ё|е|и|его|ей|их|им|ю)",
+    r"прошл\w*",
+    r"предыдущ\w*",
+    r"последн\w*",
+)
+_HISTORY_STEM_RE = re.compile("|".join(HISTORY_STEMS))
+_HISTORY_NOUN_RE = re.compile(rf"\b(?:{'|'.join(HISTORY_NOUNS)})\b")
+_HISTORY_CUE_RE = re.compile(rf"\b(?:{'|'.join(HISTORY_CUES)})\b")
+
+
+def _mentions_history(low: str) -> bool:
+    if _HISTORY_STEM_RE.search(low):
+        return True
+    return bool(_HISTORY_NOUN_RE.search(low) and _HISTORY_CUE_RE.search(low))
+
+
+def booking_flow_active(state: Dict[str, object]) -> bool:
+    """Return ``True`` while the user answers the bot's booking questions."""
+    return any(state.get(key) for key in BOOKING_FLOW_KEYS)
+
+
+def needs_history_parsing(text: str, state: Dict[str, object]) -> bool:
+    """Return ``True`` if ``text`` may be a history request worth a GPT call.
+
+    While a booking flow is active the message is an answer to the bot's
+    question, and without a history command or a phrase like "мои брони"
+    it cannot be a history request at all. Remaining ambiguous messages
+    still go to the model.
+    """
+    if booking_flow_active(state):
+        metrics.incr("history.skipped_flow")
+        return False
+    if not _mentions_history(text.lower()):
+        metrics.incr("history.skipped_keywords")
+        return False
+    return True
+
+
 async def parse_history_request(text: str) -> Dict[str, Optional[str]]:
     """Return structured history command using YandexGPT if available."""
-    headers = {
-        "Authorization": f"Bearer {YANDEX_IAM_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "modelUri": MODEL_URI,
-        "completionOptions": {
-            "stream": False,
-            "temperature": 0.2,
-            "maxTokens": 100,
-        },
-        "messages": [
-            {"role": "system", "text": build_prompt(HISTORY_PROMPT)},
-            {"role": "user", "text": text},
-        ],
-    }
+    messages = [
+        {"role": "system", "text": prompt_cache.get("history")},
+        {"role": "user", "text": text},
+    ]
+    answer = ""
     try:
-        async with create_session() as session:
-            async with session.post(
-                API_URL, headers=headers, json=payload, timeout=15
-            ) as response:
-                response.raise_for_status()
-                data = await response.json()
-                answer = (
-                    data.get("result", {})
-                    .get("alternatives", [{}])[0]
-                    .get("message", {})
-                    .get("text", "")
-                )
-                logger.info("History request result: %s", answer)
-                parsed = json.loads(_extract_json(answer))
-                if not isinstance(parsed, dict):
-                    parsed = {}
-                parsed = {k: v for k, v in parsed.items() if isinstance(k, str) and k}
-                action = str(parsed.get("action", "")).strip()
-                if action:
-                    return {
-                        "action": action,
-                        "destination": str(parsed.get("destination", "")).strip(),
-                        "limit": _safe_int(parsed.get("limit"), default=5),
-                    }
+        if STRUCTURED_OUTPUT:
+            answer = await request_completion(
+                messages, call_type="history", schema=HISTORY_SCHEMA
+            )
+            logger.info("History request result: %s", answer)
+            command = HistoryCommand.from_dict(load_object(answer))
+            if command.action:
+                return command.as_dict()
+            return _heuristic_history(text)
+        answer = await request_completion(messages, call_type="history")
+        logger.info("History request result: %s", answer)
+        parsed = _parse_json(answer)
+        if not isinstance(parsed, dict):
+            parsed = {}
+        parsed = {k: v for k, v in parsed.items() if isinstance(k, str) and k}
+        action = str(parsed.get("action", "")).strip()
+        if action:
+            return {
+                "action": action,
+                "destination": str(parsed.get("destination", "")).strip(),
+                "limit": _safe_int(parsed.get("limit"), default=5),
+            }
+    except GPTUnavailableError as e:
+        logger.info("Skipping history parsing: %s", e)
+    except (json.JSONDecodeError, SchemaError) as e:
+        _malformed("history", answer, e)
     except (asyncio.TimeoutError, aiohttp.ClientError) as e:
         logger.exception("Failed to parse history request: %s", e)
     except Exception as e:
@@ -339,48 +465,194 @@ async def parse_history_request(text: str) -> Dict[str, Optional[str]]:
     return _heuristic_history(text)
 
 
-async def parse_yes_no(text: str) -> str:
-    """Return 'yes', 'no' or 'unknown' for arbitrary confirmation text."""
-    headers = {
-        "Authorization": f"Bearer {YANDEX_IAM_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "modelUri": MODEL_URI,
-        "completionOptions": {
-            "stream": False,
-            "temperature": 0.1,
-            "maxTokens": 20,
-        },
-        "messages": [
-            {"role": "user", "text": build_prompt(YESNO_PROMPT.format(text=text))},
-        ],
+async def parse_message(
+    text: str, question: Optional[str] = None
+) -> Dict[str, Optional[str]]:
+    """Return history action and trip slots from a single YandexGPT call.
+
+    The result contains ``action``, ``limit``, ``destination``, ``origin``,
+    ``date`` and ``transport``. On failure the history heuristic is used and
+    the slots are left empty.
+    """
+    content = f"Вопрос: {question}\nОтвет: {text}" if question else text
+    messages = [
+        {"role": "system", "text": prompt_cache.get("intent")},
+        {"role": "user", "text": content},
+    ]
+    answer = ""
+    try:
+        if STRUCTURED_OUTPUT:
+            answer = await request_completion(
+                messages, call_type="intent", schema=INTENT_SCHEMA
+            )
+            logger.info("Intent result: %s", answer)
+            data = load_object(answer)
+            command = HistoryCommand.from_dict(data)
+            slots = TripSlots.from_dict(data).as_dict()
+            return {"action": command.action, "limit": command.limit, **slots}
+        answer = await request_completion(messages, call_type="intent")
+        logger.info("Intent result: %s", answer)
+        parsed = _parse_json(answer)
+        if not isinstance(parsed, dict):
+            parsed = {}
+        return {
+            "action": str(parsed.get("action") or "").strip(),
+            "limit": _safe_int(parsed.get("limit"), default=5),
+            "destination": parsed.get("destination"),
+            "origin": parsed.get("origin"),
+            "date": parsed.get("date"),
+            "transport": parsed.get("transport"),
+        }
+    except GPTUnavailableError as e:
+        logger.info("Skipping intent parsing: %s", e)
+    except (json.JSONDecodeError, SchemaError) as e:
+        _malformed("intent", answer, e)
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        logger.exception("Failed to parse message: %s", e)
+    except Exception as e:
+        logger.exception("Failed to parse message: %s", e)
+    result: Dict[str, Optional[str]] = {
+        "action": "",
+        "limit": 5,
+        "destination": None,
+        "origin": None,
+        "date": None,
+        "transport": None,
     }
+    result.update(_heuristic_history(text))
+    return result
+
+
+# --- Yes/no answers ---------------------------------------------------------
+
+YES_PHRASES = {
+    "да",
+    "ага",
+    "угу",
+    "yes",
+    "yep",
+    "sure",
+    "ok",
+    "okay",
+    "ок",
+    "окей",
+    "конечно",
+    "давай",
+    "давайте",
+    "хорошо",
+    "ладно",
+    "верно",
+    "все верно",
+    "правильно",
+    "точно",
+    "именно",
+    "подтверждаю",
+    "согласен",
+    "согласна",
+    "ну да",
+    "да конечно",
+    "да да",
+    "+",
+}
+NO_PHRASES = {
+    "нет",
+    "неа",
+    "no",
+    "nope",
+    "не",
+    "не надо",
+    "не нужно",
+    "не хочу",
+    "не верно",
+    "неверно",
+    "не правильно",
+    "неправильно",
+    "откажусь",
+    "нет нет",
+    "ну нет",
+    "-",
+}
+# Слова, которые не меняют смысла короткого ответа: "да, спасибо"
+YESNO_FILLER = {"спасибо", "пожалуйста", "ну", "так", "же", "уж", "все", "всё"}
+YES_EMOJI = {"👍", "👌", "✅", "✔", "🙆", "🤝", "👏"}
+NO_EMOJI = {"👎", "❌", "🚫", "🙅", "⛔", "✖"}
+
+
+def _classify_yes_no(text: str) -> Optional[str]:
+    """Return 'yes' or 'no' for obvious short answers, ``None`` otherwise."""
+    low = text.lower().replace("ё", "е").strip()
+    if not low:
+        return None
+    has_yes_emoji = any(e in low for e in YES_EMOJI)
+    has_no_emoji = any(e in low for e in NO_EMOJI)
+    words = re.findall(r"[a-zа-я]+|(?<!\w)[+-](?!\w)", low)
+    if not words:
+        if has_yes_emoji != has_no_emoji:
+            return "yes" if has_yes_emoji else "no"
+        return None
+    if len(words) > 4:
+        return None
+    meaningful = [w for w in words if w not in YESNO_FILLER]
+    phrase = " ".join(meaningful)
+    if phrase in YES_PHRASES and not has_no_emoji:
+        return "yes"
+    if phrase in NO_PHRASES and not has_yes_emoji:
+        return "no"
+    # "да, да, верно" / "нет. нет"
+    if meaningful and all(w in YES_PHRASES for w in meaningful) and not has_no_emoji:
+        return "yes"
+    if meaningful and all(w in NO_PHRASES for w in meaningful) and not has_yes_emoji:
+        return "no"
+    return None
+
+
+def needs_intent_parsing(text: str, state: Dict[str, object]) -> bool:
+    """Return ``True`` if ``text`` is worth a combined intent call.
+
+    Answers to extra questions and to the search offer carry no slots, and
+    an obvious "да" or "нет" to the confirmation is classified locally.
+    """
+    if state.get("extra_questions") or state.get("await_search"):
+        return False
+    if state.get("confirm") and _classify_yes_no(text):
+        metrics.incr("intent.skipped_yesno")
+        return False
+    return True
+
+
+async def parse_yes_no(text: str) -> str:
+    """Return 'yes', 'no' or 'unknown' for arbitrary confirmation text.
+
+    Obvious answers are classified locally; only ambiguous text is sent to
+    YandexGPT.
+    """
+    local = _classify_yes_no(text)
+    if local:
+        metrics.incr("yesno.local")
+        return local
+
+    messages = [
+        {"role": "user", "text": prompt_cache.get("yesno").format(text=text)},
+    ]
     try:
-        async with create_session() as session:
-            async with session.post(
-                API_URL, headers=headers, json=payload, timeout=10
-            ) as response:
-                response.raise_for_status()
-                data = await response.json()
-                answer = (
-                    data.get("result", {})
-                    .get("alternatives", [{}])[0]
-                    .get("message", {})
-                    .get("text", "")
-                )
-                parsed = json.loads(_extract_json(answer))
-                result = parsed.get("result", "").strip().lower()
-                if result in {"yes", "no"}:
-                    return result
+        answer = await within_budget(
+            request_completion(messages, call_type="yesno"),
+            None,
+        )
+        if answer is None:
+            logger.info("Yes/no parsing ran out of update budget")
+        else:
+            parsed = _parse_json(answer)
+            result = parsed.get("result", "").strip().lower()
+            if result in {"yes", "no"}:
+                metrics.incr("yesno.model")
+                return result
+    except GPTUnavailableError as e:
+        logger.info("Skipping yes/no parsing: %s", e)
     except (asyncio.TimeoutError, aiohttp.ClientError) as e:
         logger.exception("Failed to parse yes/no: %s", e)
     except Exception as e:
         logger.exception("Failed to parse yes/no: %s", e)
 
-    low = text.lower().strip()
-    if low in {"да", "ага", "угу", "yes", "yep", "sure", "ок", "окей", "конечно"}:
-        return "yes"
-    if low in {"нет", "неа", "no", "не", "не надо", "не хочу", "откажусь"}:
-        return "no"
+    metrics.incr("yesno.unknown")
     return "unknown"
@@ -0,0 +1,92 @@
+"""Пул заранее сгенерированных формулировок вопросов и подтверждений.
+
+Формулировки обновляются фоновой задачей, поэтому обработчики сообщений
+выбирают готовый вариант и не ждут ответа YandexGPT.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Dict, List, Optional
+
+from .config import PHRASE_POOL_SIZE
+from .gpt import generate_text
+from .prompts import prompt_cache
+from .texts import DEFAULT_QUESTIONS
+from .utils import display_transport
+
+logger = logging.getLogger(__name__)
+
+CONFIRM_FIELDS = ("origin", "destination", "date", "transport")
+
+
+def _valid_template(template: str) -> bool:
+    """Return ``True`` if ``template`` has every placeholder and formats."""
+    if not all(template.count(f"{{{field}}}") == 1 for field in CONFIRM_FIELDS):
+        return False
+    try:
+        template.format(**{field: "" for field in CONFIRM_FIELDS})
+    except (KeyError, IndexError, ValueError):
+        return False
+    return True
+
+
+class PhrasePool:
+    """Хранит ``size`` вариантов для каждого слота и шаблона подтверждения."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.questions: Dict[str, List[str]] = {}
+        self.confirmations: List[str] = []
+
+    def question(self, slot: str) -> Optional[str]:
+        """Return random question variant for ``slot`` or ``None``."""
+        variants = self.questions.get(slot)
+        return random.choice(variants) if variants else None
+
+    def confirmation(self, slots: Dict[str, Optional[str]]) -> Optional[str]:
+        """Return random confirmation filled with ``slots`` or ``None``."""
+        if not self.confirmations:
+            return None
+        values = {field: slots.get(field) or "" for field in CONFIRM_FIELDS}
+        values["transport"] = display_transport(slots.get("transport"))
+        return random.choice(self.confirmations).format(**values)
+
+    async def _variants(self, prompt: str) -> List[str]:
+        results = await asyncio.gather(
+            *(
+                generate_text(prompt, call_type="phrases", coalesce=False)
+                for _ in range(self.size)
+            )
+        )
+        return list(dict.fromkeys(text for text in results if text))
+
+    async def refresh(self) -> None:
+        """Regenerate all variants; keep old ones where generation failed."""
+        for slot in DEFAULT_QUESTIONS:
+            variants = await self._variants(
+                prompt_cache.get("question").format(slot=slot)
+            )
+            if variants:
+                self.questions[slot] = variants
+        templates = await self._variants(prompt_cache.get("confirm_template"))
+        templates = [t for t in templates if _valid_template(t)]
+        if templates:
+            self.confirmations = templates
+        logger.info(
+            "Phrase pool refreshed: %s questions, %s confirmations",
+            sum(len(v) for v in self.questions.values()),
+            len(self.confirmations),
+        )
+
+    async def run(self, interval: float) -> None:
+        """Refresh the pool every ``interval`` seconds until cancelled."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.exception("Failed to refresh phrase pool: %s", e)
+            await asyncio.sleep(interval)
+
+
+phrase_pool = PhrasePool(PHRASE_POOL_SIZE)
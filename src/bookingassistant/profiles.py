@@ -0,0 +1,78 @@
+"""Профили запросов к YandexGPT для каждого типа вызова.
+
+Профиль задаёт модель, лимит токенов, температуру, таймаут и потоковую
+выдачу. Значения по умолчанию можно переопределить переменной окружения
+``GPT_PROFILES`` с JSON вида ``{"slots": {"max_tokens": 300}}``.
+"""
+
+import json
+from dataclasses import dataclass, fields, replace
+from typing import Dict
+
+from .config import YANDEX_FOLDER_ID, GPT_PROFILES, GPT_STREAMING
+
+
+@dataclass(frozen=True)
+class CallProfile:
+    """Параметры запроса к модели."""
+
+    model: str = "yandexgpt-lite"
+    max_tokens: int = 100
+    temperature: float = 0.5
+    timeout: float = 15
+    stream: bool = False
+
+    @property
+    def model_uri(self) -> str:
+        """Return full model URI; short names are resolved in our folder."""
+        if "://" in self.model:
+            return self.model
+        return f"gpt://{YANDEX_FOLDER_ID}/{self.model}"
+
+
+DEFAULT_PROFILES: Dict[str, CallProfile] = {
+    "text": CallProfile(),
+    "question": CallProfile(),
+    "confirmation": CallProfile(stream=GPT_STREAMING),
+    "fallback": CallProfile(stream=GPT_STREAMING),
+    "time": CallProfile(),
+    "phrases": CallProfile(temperature=0.9),
+    "slots": CallProfile(max_tokens=2000, temperature=0.2, timeout=30),
+    "complete": CallProfile(max_tokens=2000, temperature=0.2, timeout=30),
+    "intent": CallProfile(max_tokens=200, temperature=0.2, timeout=30),
+    "history": CallProfile(max_tokens=100, temperature=0.2, timeout=15),
+    "yesno": CallProfile(max_tokens=20, temperature=0.1, timeout=10),
+}
+
+
+def load_profiles(overrides: str) -> Dict[str, CallProfile]:
+    """Return default profiles updated with JSON ``overrides``."""
+    profiles = dict(DEFAULT_PROFILES)
+    if not overrides.strip():
+        return profiles
+    try:
+        data = json.loads(overrides)
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"GPT_PROFILES is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise RuntimeError("GPT_PROFILES must be a JSON object of call types")
+    known = {f.name for f in fields(CallProfile)}
+    for call_type, values in data.items():
+        if not isinstance(values, dict):
+            raise RuntimeError(f"GPT_PROFILES entry for {call_type} must be an object")
+        unknown = set(values) - known
+        if unknown:
+            raise RuntimeError(
+                f"Unknown GPT_PROFILES fields for {call_type}: {sorted(unknown)}"
+            )
+        base = profiles.get(call_type, DEFAULT_PROFILES["text"])
+        profiles[call_type] = replace(base, **values)
+    return profiles
+
+
+PROFILES = load_profiles(GPT_PROFILES)
+
+
+def get_profile(call_type: str) -> CallProfile:
+    """Return profile for ``call_type`` (the generic one if unknown)."""
+    return PROFILES.get(call_type) or PROFILES["text"]
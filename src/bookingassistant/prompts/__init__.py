@@ -1,4 +1,9 @@
+import re
+from datetime import date, datetime
 from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from ..config import COMPACT_PROMPTS
 
 PROMPTS_DIR = Path(__file__).resolve().parent
 
@@ -13,7 +18,94 @@ SLOTS_PROMPT_TEMPLATE = load_prompt("slots_prompt_template")
 COMPLETE_PROMPT_TEMPLATE = load_prompt("complete_prompt_template")
 QUESTION_PROMPT = load_prompt("question_prompt")
 CONFIRM_PROMPT = load_prompt("confirm_prompt")
+CONFIRM_TEMPLATE_PROMPT = load_prompt("confirm_template_prompt")
 FALLBACK_PROMPT = load_prompt("fallback_prompt")
 YESNO_PROMPT = load_prompt("yesno_prompt")
 HISTORY_PROMPT = load_prompt("history_prompt")
+INTENT_PROMPT_TEMPLATE = load_prompt("intent_prompt_template")
 TIME_PROMPT = load_prompt("time_prompt")
+
+WEEKDAYS_RU = [
+    "понедельник",
+    "вторник",
+    "среда",
+    "четверг",
+    "пятница",
+    "суббота",
+    "воскресенье",
+]
+
+# Имя промпта в кэше -> файл шаблона
+SYSTEM_PROMPTS = {
+    "slots": "slots_prompt_template",
+    "complete": "complete_prompt_template",
+    "intent": "intent_prompt_template",
+    "history": "history_prompt",
+    "question": "question_prompt",
+    "confirm": "confirm_prompt",
+    "confirm_template": "confirm_template_prompt",
+    "fallback": "fallback_prompt",
+    "yesno": "yesno_prompt",
+    "time": "time_prompt",
+}
+# Сокращённые шаблоны для режима COMPACT_PROMPTS
+COMPACT_VARIANTS = {"slots": "slots_prompt_compact"}
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Return rough token count of ``text`` (words and punctuation marks)."""
+    return len(_TOKEN_RE.findall(text))
+
+
+class PromptCache:
+    """Системные промпты, собранные заранее для текущего дня.
+
+    Шаблоны читаются один раз, к каждому присоединяется общий заголовок
+    ``base.txt`` и подставляются ``{today_date}`` и ``{today_weekday}``.
+    Сборка повторяется при первом обращении после смены локальных суток.
+    Поля вроде ``{slot}`` или ``{text}`` вызывающий код подставляет сам
+    через ``str.format``.
+    """
+
+    def __init__(
+        self,
+        compact: bool = False,
+        clock: Callable[[], datetime] = datetime.now,
+    ) -> None:
+        self.compact = compact
+        self._clock = clock
+        self._templates = {
+            name: load_prompt(
+                COMPACT_VARIANTS.get(name, file) if compact else file
+            )
+            for name, file in SYSTEM_PROMPTS.items()
+        }
+        self._day: Optional[date] = None
+        self._prompts: Dict[str, str] = {}
+
+    def _build(self, now: datetime) -> None:
+        today = now.strftime("%Y-%m-%d")
+        weekday = WEEKDAYS_RU[now.weekday()]
+        self._prompts = {
+            name: f"{BASE_PROMPT} {template}".strip()
+            .replace("{today_date}", today)
+            .replace("{today_weekday}", weekday)
+            for name, template in self._templates.items()
+        }
+        self._day = now.date()
+
+    def get(self, name: str) -> str:
+        """Return prebuilt prompt ``name``, rebuilding after midnight."""
+        now = self._clock()
+        if now.date() != self._day:
+            self._build(now)
+        return self._prompts[name]
+
+    def sizes(self) -> Dict[str, int]:
+        """Return approximate token size of every prompt."""
+        return {name: estimate_tokens(self.get(name)) for name in self._templates}
+
+
+prompt_cache = PromptCache(compact=COMPACT_PROMPTS)
@@ -0,0 +1,154 @@
+"""Разбор сообщения на слова и поиск дат и транспорта за один проход.
+
+Одно скомпилированное регулярное выражение находит дни недели, слова
+"сегодня/завтра/послезавтра", числовые даты и упоминания транспорта.
+Результат кешируется, поэтому все помощники, разбирающие одно и то же
+сообщение, используют общий :class:`ScannedMessage`.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from .maps import DAYS_MAP
+
+# Полные названия дней недели совпадают по основе ("в среду", "пятницу"),
+# сокращения из DAYS_MAP ("ср", "пт.") — только целым словом, чтобы
+# "срочно" или "четыре" не превращались в день недели
+WEEKDAY_STEMS = (
+    "понедельник",
+    "вторник",
+    "сред[аеуы]",
+    "четверг",
+    "пятниц",
+    "суббот",
+    "воскресень",
+)
+RELATIVE_DAYS = {"сегодня": 0, "завтра": 1, "послезавтра": 2}
+# Порядок задаёт приоритет, если в сообщении упомянуто несколько видов
+TRANSPORT_STEMS = {
+    "bus": ("автобус", "маршрутк", "atlas", "шкипер", "bus", "бус", "бас"),
+    "plane": (
+        "самол[еёe]т",
+        "самолетик",
+        "птичк",
+        "авиабилет",
+        "plane",
+        "полететь",
+        "лететь",
+    ),
+    # "ж/д", "жд"; прежний шаблон "ж.?д" находил ещё и "жду"
+    "train": ("поезд", "электричк", "ржд", "сапсан", "train", r"ж[/.-]?д(?!\w)"),
+}
+
+
+def _alternation(words) -> str:
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+def _weekday_pattern(day: int) -> str:
+    stem = WEEKDAY_STEMS[day]
+    short = [
+        word
+        for word, number in DAYS_MAP.items()
+        if number == day and not re.match(stem, word)
+    ]
+    return rf"\b(?P<day{day}>{stem}\w*|(?:{_alternation(short)})\b\.?)"
+
+
+_SCAN_RE = re.compile(
+    "|".join(
+        [
+            r"(?P<iso>\b\d{4}-\d{2}-\d{2}\b)",
+            r"(?P<numeric>\d{1,2}[./]\d{1,2})",
+            rf"\b(?P<relative>{_alternation(RELATIVE_DAYS)})\b",
+        ]
+        + [_weekday_pattern(day) for day in range(7)]
+        + [
+            rf"\b(?P<{code}>{_alternation(stems)})\w*"
+            for code, stems in TRANSPORT_STEMS.items()
+        ]
+    )
+)
+_WORD_RE = re.compile(r"[^\W\d_][\w-]*")
+
+
+@dataclass(frozen=True)
+class Hit:
+    """Найденная дата или транспорт: вид, значение и позиции в тексте."""
+
+    kind: str
+    value: object
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class Token:
+    """Слово сообщения: исходный вид, нижний регистр и позиции."""
+
+    text: str
+    low: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class ScannedMessage:
+    """Слова сообщения и всё, что нашёл общий шаблон."""
+
+    text: str
+    low: str
+    tokens: Tuple[Token, ...]
+    hits: Tuple[Hit, ...]
+
+    def of_kind(self, kind: str) -> Tuple[Hit, ...]:
+        return tuple(hit for hit in self.hits if hit.kind == kind)
+
+    @property
+    def weekday(self) -> Optional[int]:
+        """Return the first mentioned weekday number (0 is Monday)."""
+        days = self.of_kind("weekday")
+        return days[0].value if days else None
+
+    @property
+    def has_date(self) -> bool:
+        """Return ``True`` if the message names a day in any form."""
+        return any(hit.kind != "transport" for hit in self.hits)
+
+    @property
+    def transport(self) -> Optional[str]:
+        """Return transport code, ``bus`` before ``plane`` before ``train``."""
+        found = {hit.value for hit in self.of_kind("transport")}
+        return next((code for code in TRANSPORT_STEMS if code in found), None)
+
+    def covers(self, start: int) -> bool:
+        """Return ``True`` if position ``start`` belongs to some hit."""
+        return any(hit.start <= start < hit.end for hit in self.hits)
+
+
+def _hit(match: re.Match) -> Hit:
+    kind = match.lastgroup
+    text = match.group(kind)
+    if kind.startswith("day"):
+        kind, value = "weekday", int(kind[3:])
+    elif kind == "relative":
+        value = RELATIVE_DAYS[text]
+    elif kind in ("iso", "numeric"):
+        kind, value = "date", text
+    else:
+        kind, value = "transport", kind
+    return Hit(kind, value, match.start(), match.end())
+
+
+@lru_cache(maxsize=256)
+def scan_message(text: str) -> ScannedMessage:
+    """Split ``text`` into words and find date and transport mentions once."""
+    low = text.lower()
+    tokens = tuple(
+        Token(text[m.start() : m.end()], m.group(), m.start(), m.end())
+        for m in _WORD_RE.finditer(low)
+    )
+    hits = tuple(_hit(match) for match in _SCAN_RE.finditer(low))
+    return ScannedMessage(text, low, tokens, hits)
@@ -0,0 +1,132 @@
+"""Схемы структурированных ответов YandexGPT.
+
+В режиме ``STRUCTURED_OUTPUT`` JSON-схема отправляется вместе с запросом,
+а ответ модели проверяется типизированными моделями ниже вместо поиска
+JSON в тексте и ручной чистки значений вроде ``"none"`` или ``"пусто"``.
+"""
+
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+TRANSPORTS = ("bus", "train", "plane")
+ACTIONS = ("show", "cancel", "")
+
+_SLOT_PROPERTIES: Dict[str, Any] = {
+    "origin": {"type": "string"},
+    "destination": {"type": "string"},
+    "date": {"type": "string"},
+    "transport": {"type": "string", "enum": [*TRANSPORTS, ""]},
+}
+
+SLOTS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": _SLOT_PROPERTIES,
+    "required": list(_SLOT_PROPERTIES),
+}
+
+HISTORY_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": list(ACTIONS)},
+        "destination": {"type": "string"},
+        "limit": {"type": "integer"},
+    },
+    "required": ["action"],
+}
+
+INTENT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": list(ACTIONS)},
+        "limit": {"type": "integer"},
+        **_SLOT_PROPERTIES,
+    },
+    "required": ["action", *_SLOT_PROPERTIES],
+}
+
+
+class SchemaError(ValueError):
+    """Ответ модели не соответствует ожидаемой схеме."""
+
+
+def load_object(text: str) -> Dict[str, Any]:
+    """Parse ``text`` as a single JSON object or raise :class:`SchemaError`."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise SchemaError(f"answer is not JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise SchemaError(f"expected object, got {type(data).__name__}")
+    return data
+
+
+def _optional_str(data: Dict[str, Any], key: str) -> Optional[str]:
+    value = data.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise SchemaError(f"{key} must be a string, got {value!r}")
+    return value.strip() or None
+
+
+@dataclass(frozen=True)
+class TripSlots:
+    """Параметры поездки; пустые значения хранятся как ``None``."""
+
+    origin: Optional[str] = None
+    destination: Optional[str] = None
+    date: Optional[str] = None
+    transport: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TripSlots":
+        """Validate ``data`` and return slots or raise :class:`SchemaError`."""
+        date = _optional_str(data, "date")
+        if date is not None:
+            try:
+                datetime.strptime(date, "%Y-%m-%d")
+            except ValueError as e:
+                raise SchemaError(f"date must be YYYY-MM-DD, got {date!r}") from e
+        transport = _optional_str(data, "transport")
+        if transport is not None and transport not in TRANSPORTS:
+            raise SchemaError(f"unknown transport {transport!r}")
+        return cls(
+            origin=_optional_str(data, "origin"),
+            destination=_optional_str(data, "destination"),
+            date=date,
+            transport=transport,
+        )
+
+    def as_dict(self) -> Dict[str, Optional[str]]:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class HistoryCommand:
+    """Команда для истории поездок: показать или отменить."""
+
+    action: str = ""
+    destination: str = ""
+    limit: int = 5
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HistoryCommand":
+        """Validate ``data`` and return command or raise :class:`SchemaError`."""
+        action = _optional_str(data, "action") or ""
+        if action not in ACTIONS:
+            raise SchemaError(f"unknown action {action!r}")
+        limit = data.get("limit")
+        if limit is None:
+            limit = 5
+        elif isinstance(limit, bool) or not isinstance(limit, int):
+            raise SchemaError(f"limit must be an integer, got {limit!r}")
+        return cls(
+            action=action,
+            destination=_optional_str(data, "destination") or "",
+            limit=limit if limit > 0 else 5,
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
@@ -1,61 +1,212 @@
 import logging
 import re
-from typing import Dict, Optional, Iterable
+from functools import lru_cache
+from typing import Dict, Optional
 
+from .config import STRUCTURED_OUTPUT
 from .parser import parse_slots, parse_transport
 from .utils import normalize_date
-from .maps import DAYS_MAP
+from .gazetteer import CityMatch, find_cities, gazetteer, normalize
+from .scanner import ScannedMessage, Token, scan_message
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
 
-# Common city aliases/abbreviations to recognise in user messages. The values
-# are stems or short forms that may appear instead of the full city name.
-CITY_ALIASES: dict[str, Iterable[str]] = {
-    "москва": ("моск", "мск"),
-    "санкт-петербург": ("санкт-петербург", "санкт петербург", "спб", "питер"),
-    "екатеринбург": ("екатеринбург", "екб"),
-    "казань": ("казан",),
+SLOT_KEYS = ("origin", "destination", "date", "transport")
+
+# Слово после этих предлогов может оказаться городом
+PLACE_PREPOSITIONS = {"из", "от", "в", "во", "до"}
+# Предлог непосредственно перед названием города
+_ROLE_RE = re.compile(r"(?<![\w-])(из|от|в|во|на|до)\s+$")
+ROLE_PREPOSITIONS = {
+    "из": "origin",
+    "от": "origin",
+    "в": "destination",
+    "во": "destination",
+    "на": "destination",
+    "до": "destination",
+}
+# Минимальная уверенность нечёткого совпадения с городом из справочника
+CITY_MIN_CONFIDENCE = 0.8
+# Слова, которые встречаются после предлогов, но не являются городами
+NON_PLACE_WORDS = {
+    "сегодня",
+    "завтра",
+    "послезавтра",
+    "общем",
+    "целом",
+    "течение",
+    "сколько",
+    "город",
+    "дорогу",
+    "путь",
+    "поездку",
+    "поездке",
+    "поездки",
+    "выходные",
+    "да",
+    "нет",
+    "спасибо",
+    "привет",
 }
 
 
+def _is_known_word(token: Token, scan: ScannedMessage) -> bool:
+    """Return ``True`` if ``token`` is explained by the local extractors."""
+    return token.low in NON_PLACE_WORDS or scan.covers(token.start)
+
+
+def _place_candidates(scan: ScannedMessage) -> list[Token]:
+    """Return words that may name a city missing from the gazetteer.
+
+    These are words after direction prepositions and capitalised or Latin
+    words; a capital letter at the start of a longer sentence says nothing.
+    """
+    short = len(scan.tokens) <= 2
+    found = []
+    previous = None
+    for token in scan.tokens:
+        after_preposition = (
+            previous is not None
+            and previous.low in PLACE_PREPOSITIONS
+            and not scan.text[previous.end : token.start].strip()
+        )
+        proper = len(token.text) >= 3 and (
+            token.text[0].isupper()
+            or (token.low.isascii() and token.low.replace("-", "").isalpha())
+        )
+        if after_preposition or (
+            proper and (short or scan.text[: token.start].strip())
+        ):
+            found.append(token)
+        previous = token
+    return found
+
+
+def _fuzzy_threshold(word: str) -> float:
+    """Return minimal confidence to accept ``word`` as a misspelt city."""
+    # Строчные русские слова чаще оказываются обычными словами ("в курсе")
+    if word[0].islower() and not word.isascii():
+        return 0.85
+    return CITY_MIN_CONFIDENCE
+
+
+@lru_cache(maxsize=256)
+def _scan_cities(message: str) -> tuple[tuple[CityMatch, ...], bool]:
+    """Return city mentions in ``message`` and whether unknown places remain.
+
+    Exact forms come from the gazetteer. Candidate place words it does not
+    cover are corrected with the fuzzy matcher (adjacent pairs first, for
+    names like "Nizhniy Novgorod"); words that cannot be corrected may be
+    unknown cities.
+    """
+    scan = scan_message(message)
+    matches = list(find_cities(message))
+    covered = {pos for match in matches for pos in range(match.start, match.end)}
+    spans = [
+        (token.start, token.end, token.text)
+        for token in _place_candidates(scan)
+        if token.start not in covered and not _is_known_word(token, scan)
+    ]
+    unknown = False
+    i = 0
+    while i < len(spans):
+        start, end, word = spans[i]
+        pair = spans[i + 1] if i + 1 < len(spans) else None
+        if pair and not message[end : pair[0]].strip():
+            corrected = gazetteer.correct(message[start : pair[1]])
+            if corrected and corrected[1] >= _fuzzy_threshold(word):
+                matches.append(CityMatch(corrected[0], start, pair[1]))
+                i += 2
+                continue
+        corrected = gazetteer.correct(word)
+        if corrected and corrected[1] >= _fuzzy_threshold(word):
+            matches.append(CityMatch(corrected[0], start, end))
+        else:
+            unknown = True
+        i += 1
+    matches.sort(key=lambda match: match.start)
+    return tuple(matches), unknown
+
+
+def _canonical_city(name: str) -> str:
+    """Return official name for a city alias, typo or transliteration."""
+    corrected = gazetteer.correct(name)
+    if corrected and corrected[1] >= CITY_MIN_CONFIDENCE:
+        return corrected[0]
+    return name
+
+
+def _local_slots(
+    message: str, expected: Optional[str]
+) -> tuple[Dict[str, Optional[str]], set[str]]:
+    """Extract slots with local rules.
+
+    Returns ``(slots, unresolved)`` where ``unresolved`` names the slots the
+    message may affect but the rules could not determine confidently; only
+    those need the model.
+    """
+    slots: Dict[str, Optional[str]] = dict.fromkeys(SLOT_KEYS)
+    unresolved: set[str] = set()
+
+    slots["date"] = normalize_date(message)
+    if not slots["date"] and _date_in_message(message):
+        unresolved.add("date")
+
+    slots["transport"] = parse_transport(message)
+
+    matches, unknown = _scan_cities(message)
+    cities = list(dict.fromkeys(match.city for match in matches))
+    roles = {city: _detect_city_role(city, message) for city in cities}
+    if len(cities) > 2 or (len(cities) == 2 and None in roles.values()):
+        # Word order alone does not tell which city is which
+        unresolved.update({"origin", "destination"})
+    for city, role in roles.items():
+        if role is None:
+            role = expected if expected in {"origin", "destination"} else None
+        slots[role or "destination"] = city
+    if unknown:
+        unresolved.update({"origin", "destination"})
+    if expected in {"origin", "destination"} and not cities:
+        unresolved.add(expected)
+    return slots, unresolved
+
+
+def _city_stem(city: str) -> str:
+    """Return stem of a city missing from the gazetteer ("тверь" -> "твер")."""
+    low = normalize(city).strip()
+    return low[:-1] if len(low) > 4 and low[-1] in "аеиоуыьюяй" else low
+
+
+def _city_positions(city: str, message: str) -> list[int]:
+    """Return start positions of ``city`` mentions in ``message``."""
+    canonical = gazetteer.canonical(city)
+    if canonical:
+        matches, _ = _scan_cities(message)
+        return [m.start for m in matches if m.city == canonical]
+    pattern = rf"(?<![\w-]){re.escape(_city_stem(city))}"
+    return [m.start() for m in re.finditer(pattern, normalize(message))]
+
+
 def _city_in_message(city: str, message: str) -> bool:
-    """Return ``True`` if ``message`` contains ``city`` or its alias."""
-    low_city = city.lower()
-    aliases = set(CITY_ALIASES.get(low_city, ()))
-    aliases.add(low_city[:4])
-    return any(alias and alias in message for alias in aliases)
+    """Return ``True`` if ``message`` mentions ``city`` in any form or alias."""
+    return bool(_city_positions(city, message))
 
 
 def _detect_city_role(city: str, message: str) -> Optional[str]:
     """Return 'origin' or 'destination' if preposition before ``city`` indicates direction."""
-    low_msg = message.lower()
-    aliases = [city.lower(), *CITY_ALIASES.get(city.lower(), ())]
-    for alias in aliases:
-        if not alias:
-            continue
-        pattern = rf"\b(из|от|в|во|на)\s+{re.escape(alias)}\w*"
-        match = re.search(pattern, low_msg)
+    low_msg = scan_message(message).low
+    for start in _city_positions(city, message):
+        match = _ROLE_RE.search(low_msg, max(0, start - 8), start)
         if match:
-            prep = match.group(1)
-            if prep in {"из", "от"}:
-                return "origin"
-            if prep in {"в", "во", "на"}:
-                return "destination"
+            return ROLE_PREPOSITIONS[match.group(1)]
     return None
 
 
 def _date_in_message(text: str) -> bool:
     """Return True if ``text`` contains explicit date or weekday words."""
-    low = text.lower()
-    if re.search(r"\b(сегодня|завтра|послезавтра)\b", low):
-        return True
-    for word in DAYS_MAP:
-        if re.search(rf"\b{re.escape(word)}\w*", low):
-            return True
-    if re.search(r"\d{1,2}[./]\d{1,2}", low) or re.search(r"\b\d{4}-\d{2}-\d{2}\b", low):
-        return True
-    return False
+    return scan_message(text).has_date
 
 
 def _expected_slot(question: Optional[str]) -> Optional[str]:
@@ -79,6 +230,7 @@ async def update_slots(
     message: str,
     session_data: Dict[int, Dict[str, Optional[str]]],
     question: Optional[str] = None,
+    parsed: Optional[Dict[str, Optional[str]]] = None,
 ) -> tuple[Dict[str, Optional[str]], Dict[str, str]]:
     """Update saved slots for a user based on correction message.
 
@@ -95,6 +247,11 @@ async def update_slots(
         New user message containing corrections.
     session_data: dict
         Mapping ``user_id -> slots`` with previously gathered data.
+    parsed: dict, optional
+        Slots already extracted from ``message`` (e.g. by the combined intent
+        request). When given, :func:`parse_slots` is not called. Otherwise
+        local rules run first and :func:`parse_slots` is asked only about
+        the slots they could not resolve.
 
     Returns
     -------
@@ -116,33 +273,46 @@ async def update_slots(
 
     logger.info("Editing slots for %s: %s", user_id, message)
 
-    parsed = await parse_slots(message, question)
-    for key, value in parsed.items():
-        if isinstance(value, str):
-            cleaned = value.strip().lower()
-            if cleaned in {"", "none", "null", "пусто", "нет"}:
-                parsed[key] = None
-            else:
-                parsed[key] = value.strip()
-
-    low_msg = message.lower()
     expected = _expected_slot(question)
 
+    if parsed is None:
+        # Local rules first; the model only gets the slots they left open
+        parsed, unresolved = _local_slots(message, expected)
+        if unresolved:
+            metrics.incr("slots.model")
+            model = await parse_slots(message, question, sorted(unresolved))
+            for key in unresolved:
+                parsed[key] = model.get(key) or parsed[key]
+        else:
+            metrics.incr("slots.local")
+        external = False
+    else:
+        parsed = dict(parsed)
+        external = True
+    # Structured answers are already validated and use ``None`` for empty
+    # values; free-form ones need placeholder words cleaned up.
+    if not STRUCTURED_OUTPUT:
+        for key, value in parsed.items():
+            if isinstance(value, str):
+                cleaned = value.strip().lower()
+                if cleaned in {"", "none", "null", "пусто", "нет"}:
+                    parsed[key] = None
+                else:
+                    parsed[key] = value.strip()
+
     # Validate and override date/transport with local heuristics based on
     # the actual user message so that the bot does not invent unseen data.
-    user_date = normalize_date(message)
-    if user_date:
-        parsed["date"] = user_date
-    elif not _date_in_message(message):
-        parsed["date"] = None
-
-    user_transport = parse_transport(message)
-    if user_transport:
-        parsed["transport"] = user_transport
-    else:
-        parsed["transport"] = None
+    # Locally extracted slots already went through the same rules.
+    if external:
+        user_date = normalize_date(message)
+        if user_date:
+            parsed["date"] = user_date
+        elif not _date_in_message(message):
+            parsed["date"] = None
+        parsed["transport"] = parse_transport(message)
 
-    # Drop origin/destination values that are not mentioned in the user's
+    # Normalise city names via the gazetteer (aliases, typos, Latin), then
+    # drop origin/destination values that are not mentioned in the user's
     # message or contradict the detected prepositions to prevent hallucinated
     # cities from overwriting existing slots. If a city clearly has the
     # opposite role (e.g. the model put it in ``origin`` but the message says
@@ -151,18 +321,19 @@ async def update_slots(
         value = parsed.get(key)
         if not value:
             continue
-        role = _detect_city_role(value, low_msg)
+        value = parsed[key] = _canonical_city(value)
+        role = _detect_city_role(value, message)
         if role and role != key:
             parsed[key] = None
             parsed[role] = value
             continue
-        if not role and not _city_in_message(value, low_msg):
+        if not role and not _city_in_message(value, message):
             parsed[key] = None
 
     if expected in {"origin", "destination"}:
         other = "destination" if expected == "origin" else "origin"
         if not parsed.get(expected) and parsed.get(other):
-            role = _detect_city_role(parsed[other], low_msg)
+            role = _detect_city_role(parsed[other], message)
             if not role:
                 parsed[expected] = parsed[other]
                 parsed[other] = None
@@ -172,7 +343,7 @@ async def update_slots(
     unique = {c for c in (parsed.get("origin"), parsed.get("destination")) if c}
     if len(unique) == 1:
         city = unique.pop()
-        role = _detect_city_role(city, low_msg)
+        role = _detect_city_role(city, message)
         if role == "origin":
             parsed["origin"] = city
             parsed["destination"] = None
@@ -0,0 +1,259 @@
+"""Хранилища состояния диалога: в памяти, SQLite и Postgres.
+
+Хранилище выбирается по схеме ``STATE_DB_URL``:
+
+* ``memory://`` — словарь в памяти процесса (тесты, нагрузочные прогоны);
+* ``sqlite:///path/to/state.db`` — файл SQLite для одного сервера;
+* ``postgresql://...`` — таблица ``user_state`` в Postgres.
+
+Каждое хранилище помнит время последнего изменения состояния. Состояния
+старше ``ttl`` секунд считаются брошенными: они не читаются и удаляются
+методом :meth:`StateBackend.sweep`, который периодически вызывает бот.
+"""
+
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+State = Dict[str, Any]
+
+
+class StateBackend(ABC):
+    """Общий интерфейс хранилищ состояния.
+
+    ``ttl`` — время жизни состояния в секундах (0 — хранить бессрочно).
+    """
+
+    def __init__(self, ttl: float = 0, clock=time.time) -> None:
+        self.ttl = ttl
+        self._clock = clock
+
+    def _deadline(self) -> float:
+        """Return timestamp before which states are expired."""
+        return self._clock() - self.ttl if self.ttl > 0 else float("-inf")
+
+    @abstractmethod
+    async def load(self, user_id: int) -> Optional[State]:
+        """Return saved state of ``user_id`` unless it is missing or expired."""
+
+    @abstractmethod
+    async def write(self, upserts: Dict[int, State], deletes: List[int]) -> None:
+        """Save ``upserts`` and delete ``deletes`` in one batch."""
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Delete expired states and return how many were removed."""
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Состояния в словаре процесса; после перезапуска они теряются."""
+
+    def __init__(self, ttl: float = 0, clock=time.time) -> None:
+        super().__init__(ttl, clock)
+        self._rows: Dict[int, Tuple[str, float]] = {}
+
+    async def load(self, user_id: int) -> Optional[State]:
+        row = self._rows.get(user_id)
+        if row is None or row[1] < self._deadline():
+            return None
+        return json.loads(row[0])
+
+    async def write(self, upserts: Dict[int, State], deletes: List[int]) -> None:
+        now = self._clock()
+        for user_id, state in upserts.items():
+            self._rows[user_id] = (json.dumps(state), now)
+        for user_id in deletes:
+            self._rows.pop(user_id, None)
+
+    async def sweep(self) -> int:
+        deadline = self._deadline()
+        expired = [uid for uid, (_, updated) in self._rows.items() if updated < deadline]
+        for user_id in expired:
+            del self._rows[user_id]
+        return len(expired)
+
+
+class SQLiteBackend(StateBackend):
+    """Таблица ``user_state`` в файле SQLite через ``aiosqlite``."""
+
+    def __init__(self, path: str, ttl: float = 0, clock=time.time) -> None:
+        super().__init__(ttl, clock)
+        self.path = path
+        self._db = None
+
+    async def _connect(self):
+        if self._db is None:
+            import aiosqlite
+
+            self._db = await aiosqlite.connect(self.path)
+            await self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS user_state (
+                    user_id INTEGER PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            await self._db.execute(
+                "CREATE INDEX IF NOT EXISTS user_state_updated_at "
+                "ON user_state (updated_at)"
+            )
+            await self._db.commit()
+        return self._db
+
+    async def load(self, user_id: int) -> Optional[State]:
+        db = await self._connect()
+        async with db.execute(
+            "SELECT state FROM user_state WHERE user_id = ? AND updated_at >= ?",
+            (user_id, self._deadline()),
+        ) as cursor:
+            row = await cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def write(self, upserts: Dict[int, State], deletes: List[int]) -> None:
+        db = await self._connect()
+        now = self._clock()
+        await db.executemany(
+            """
+            INSERT INTO user_state (user_id, state, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (user_id)
+            DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+            """,
+            [(uid, json.dumps(state), now) for uid, state in upserts.items()],
+        )
+        await db.executemany(
+            "DELETE FROM user_state WHERE user_id = ?", [(uid,) for uid in deletes]
+        )
+        await db.commit()
+
+    async def sweep(self) -> int:
+        if self.ttl <= 0:
+            return 0
+        db = await self._connect()
+        cursor = await db.execute(
+            "DELETE FROM user_state WHERE updated_at < ?", (self._deadline(),)
+        )
+        await db.commit()
+        return cursor.rowcount
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+class PostgresBackend(StateBackend):
+    """Таблица ``user_state`` в Postgres через пул ``asyncpg``.
+
+    Время изменения хранится в колонке ``updated_at``; она добавляется и в
+    таблицы, созданные до появления срока жизни состояний. Как и в других
+    хранилищах, время берётся из ``clock`` бота, а не с сервера базы.
+    """
+
+    def __init__(self, url: str, ttl: float = 0, clock=time.time) -> None:
+        super().__init__(ttl, clock)
+        self.url = url
+        self._pool = None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            import asyncpg
+
+            self._pool = await asyncpg.create_pool(self.url)
+            async with self._pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS user_state (
+                        user_id BIGINT PRIMARY KEY,
+                        state JSONB
+                    );
+                    ALTER TABLE user_state ADD COLUMN IF NOT EXISTS
+                        updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+                    CREATE INDEX IF NOT EXISTS user_state_updated_at
+                        ON user_state (updated_at);
+                    """
+                )
+        return self._pool
+
+    async def load(self, user_id: int) -> Optional[State]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            if self.ttl > 0:
+                row = await conn.fetchrow(
+                    """
+                    SELECT state FROM user_state
+                    WHERE user_id = $1 AND updated_at >= to_timestamp($2)
+                    """,
+                    user_id,
+                    self._deadline(),
+                )
+            else:
+                row = await conn.fetchrow(
+                    "SELECT state FROM user_state WHERE user_id = $1", user_id
+                )
+        return json.loads(row["state"]) if row and row["state"] is not None else None
+
+    async def write(self, upserts: Dict[int, State], deletes: List[int]) -> None:
+        pool = await self._get_pool()
+        now = self._clock()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if upserts:
+                    await conn.executemany(
+                        """
+                        INSERT INTO user_state (user_id, state, updated_at)
+                        VALUES ($1, $2, to_timestamp($3))
+                        ON CONFLICT (user_id) DO UPDATE
+                        SET state = EXCLUDED.state, updated_at = EXCLUDED.updated_at
+                        """,
+                        [
+                            (uid, json.dumps(state), now)
+                            for uid, state in upserts.items()
+                        ],
+                    )
+                if deletes:
+                    await conn.execute(
+                        "DELETE FROM user_state WHERE user_id = ANY($1::bigint[])",
+                        deletes,
+                    )
+
+    async def sweep(self) -> int:
+        if self.ttl <= 0:
+            return 0
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            status = await conn.execute(
+                "DELETE FROM user_state WHERE updated_at < to_timestamp($1)",
+                self._deadline(),
+            )
+        # asyncpg returns the command tag, e.g. "DELETE 3"
+        count = status.rpartition(" ")[2] if isinstance(status, str) else ""
+        return int(count) if count.isdigit() else 0
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+SCHEMES = ("memory", "sqlite", "postgres", "postgresql")
+
+
+def create_backend(url: str, ttl: float = 0) -> StateBackend:
+    """Return a backend for ``url`` according to its scheme."""
+    scheme, _, rest = url.partition("://")
+    if scheme == "memory":
+        return MemoryBackend(ttl)
+    if scheme == "sqlite":
+        # Как в SQLAlchemy: sqlite:///relative.db и sqlite:////abs/path.db
+        return SQLiteBackend(rest[1:] if rest.startswith("/") else rest, ttl)
+    if scheme in ("postgres", "postgresql"):
+        return PostgresBackend(url, ttl)
+    raise ValueError(
+        f"Unsupported STATE_DB_URL scheme {scheme!r}, expected one of {', '.join(SCHEMES)}"
+    )
@@ -0,0 +1,178 @@
+"""Разбор времени суток в русских ответах без обращения к модели.
+
+Понимает "18:30", "в 8 утра", "в восемь вечера", "в половине седьмого",
+"без четверти девять", "полдень", "к вечеру", "после обеда" и интервалы
+вроде "с 8 до 10" или "между 9 и 11 вечера". Время возвращается как
+``HH:MM``, интервал — как ``HH:MM-HH:MM``. Часть суток может стоять и
+перед числом ("вечером часов в 7"); относительное "через 2 часа" временем
+суток не считается.
+"""
+
+import re
+from typing import Optional, Tuple
+
+from .gazetteer import normalize
+
+HOUR_WORDS = {
+    "час": 1,
+    "один": 1,
+    "два": 2,
+    "три": 3,
+    "четыре": 4,
+    "пять": 5,
+    "шесть": 6,
+    "семь": 7,
+    "восемь": 8,
+    "девять": 9,
+    "десять": 10,
+    "одиннадцать": 11,
+    "двенадцать": 12,
+}
+# "половина седьмого" — 6:30, поэтому храним номер следующего часа
+NEXT_HOUR_WORDS = {
+    "первого": 1,
+    "второго": 2,
+    "третьего": 3,
+    "четвертого": 4,
+    "пятого": 5,
+    "шестого": 6,
+    "седьмого": 7,
+    "восьмого": 8,
+    "девятого": 9,
+    "десятого": 10,
+    "одиннадцатого": 11,
+    "двенадцатого": 12,
+}
+# Части суток: начало и конец, а также выражения "к вечеру", "после обеда"
+PERIODS = {
+    "утр": ("06:00", "12:00"),
+    "обед": ("12:00", "14:00"),
+    "днем": ("12:00", "18:00"),
+    "вечер": ("18:00", "23:00"),
+    "ноч": ("00:00", "06:00"),
+}
+# "вечером часов в 7", "в 7, вечером": часть суток отдельно от числа
+DAY_PARTS = {
+    "утра": "утра",
+    "утром": "утра",
+    "дня": "дня",
+    "днем": "дня",
+    "вечера": "вечера",
+    "вечером": "вечера",
+    "ночи": "ночи",
+    "ночью": "ночи",
+}
+FIXED_TIMES = {
+    "полдень": "12:00",
+    "полдня": "12:00",
+    "полудня": "12:00",
+    "полночь": "00:00",
+    "полуночи": "00:00",
+}
+
+
+def _alternation(words) -> str:
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+_PART = r"(?:\s+(?P<part>утра|дня|вечера|ночи))?"
+_POINT_RE = re.compile(
+    "(?:"
+    + "|".join(
+        [
+            r"\b(?P<h>\d{1,2})(?:[:.](?P<m>\d{2})|\s*ч(?:ас\w*)?)?(?![\d:]|[./]\d)",
+            rf"\b(?P<hw>{_alternation(HOUR_WORDS)})\b(?:\s+час\w*)?",
+            rf"\b(?:половин[аеу]\s+|пол-?)(?P<half>{_alternation(NEXT_HOUR_WORDS)})\b",
+            rf"\bчетверть\s+(?P<quarter>{_alternation(NEXT_HOUR_WORDS)})\b",
+            rf"\bбез\s+(?:четверти|пятнадцати)\s+"
+            rf"(?P<to>\d{{1,2}}|{_alternation(HOUR_WORDS)})\b",
+        ]
+    )
+    + ")"
+    + _PART
+)
+_DAY_PART_RE = re.compile(rf"\b(?:{_alternation(DAY_PARTS)})\b")
+# "через 2 часа", "через полчаса" — это не время суток
+_RELATIVE_RE = re.compile(r"\bчерез\s+(?:[\w-]+\s+)?(?:час|минут|полчаса)")
+_RANGE_GAP_RE = re.compile(r"\s*(?:-|–|—|до|по|и)\s*")
+_PERIOD_RE = re.compile(
+    rf"\b(?P<fixed>{_alternation(FIXED_TIMES)})\b"
+    rf"|(?:\b(?P<prep>к|после|до)\s+)?\b(?P<period>{_alternation(PERIODS)})\w*"
+)
+
+
+def _hour_value(text: str) -> int:
+    return int(text) if text.isdigit() else HOUR_WORDS[text]
+
+
+def _point(match: re.Match) -> Optional[Tuple[int, int]]:
+    """Return ``(hour, minute)`` of a matched time without a day part."""
+    if match.group("h"):
+        hour, minute = int(match.group("h")), int(match.group("m") or 0)
+    elif match.group("hw"):
+        hour, minute = HOUR_WORDS[match.group("hw")], 0
+    elif match.group("half"):
+        hour, minute = NEXT_HOUR_WORDS[match.group("half")] - 1, 30
+    elif match.group("quarter"):
+        hour, minute = NEXT_HOUR_WORDS[match.group("quarter")] - 1, 15
+    else:
+        hour, minute = _hour_value(match.group("to")) - 1, 45
+    if hour > 24 or minute > 59:
+        return None
+    return hour % 24, minute
+
+
+def _apply_part(hour: int, part: Optional[str]) -> int:
+    """Convert 12-hour ``hour`` to 24-hour using "утра/дня/вечера/ночи"."""
+    if part == "дня" and hour < 7 or part == "вечера" and hour < 12:
+        return hour + 12
+    if part == "ночи":
+        return 0 if hour == 12 else hour + 12 if hour >= 9 else hour
+    return hour
+
+
+def _day_part(low: str) -> Optional[str]:
+    """Return the part of day named anywhere in ``low``, if any."""
+    match = _DAY_PART_RE.search(low)
+    return DAY_PARTS[match.group()] if match else None
+
+
+def _format(hour: int, minute: int) -> str:
+    return f"{hour:02d}:{minute:02d}"
+
+
+def parse_time(text: str) -> Optional[str]:
+    """Return ``HH:MM`` or ``HH:MM-HH:MM`` mentioned in ``text`` or ``None``."""
+    low = normalize(text)
+    if _RELATIVE_RE.search(low):
+        return None
+    matches = [m for m in _POINT_RE.finditer(low) if _point(m)]
+    if matches:
+        first = matches[0]
+        hour, minute = _point(first)
+        detached = _day_part(low)
+        part = first.group("part") or detached
+        if len(matches) > 1 and _RANGE_GAP_RE.fullmatch(
+            low[first.end() : matches[1].start()]
+        ):
+            end_hour, end_minute = _point(matches[1])
+            end_part = matches[1].group("part") or detached
+            # "с 8 до 10 вечера": часть суток относится к обоим концам
+            start = _format(_apply_part(hour, part or end_part), minute)
+            return f"{start}-{_format(_apply_part(end_hour, end_part), end_minute)}"
+        return _format(_apply_part(hour, part), minute)
+
+    match = _PERIOD_RE.search(low)
+    if not match:
+        return None
+    if match.group("fixed"):
+        return FIXED_TIMES[match.group("fixed")]
+    start, end = PERIODS[match.group("period")]
+    prep = match.group("prep")
+    if prep == "к":
+        return start
+    if prep == "после":
+        return end
+    if prep == "до":
+        return f"{PERIODS['утр'][0]}-{start}" if start != "00:00" else None
+    return f"{start}-{end}"
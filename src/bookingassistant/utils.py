@@ -3,11 +3,12 @@ import re
 from datetime import datetime, timedelta
 from typing import Optional
 
-import dateparser
-
-from .gpt import build_prompt, generate_text
+from .gpt import generate_text, within_budget
 from .maps import DAYS_MAP, TRANSPORT_RU
-from .prompts import TIME_PROMPT
+from .dates import parse_date
+from .prompts import prompt_cache
+from .times import parse_time
+from . import metrics
 
 
 def next_weekday(target_word: str) -> str:
@@ -26,27 +27,24 @@ def next_weekday(target_word: str) -> str:
 
 def normalize_date(text: str) -> Optional[str]:
     """Возвращает дату в формате YYYY-MM-DD или None."""
-    text_lower = text.lower()
-    for word in DAYS_MAP:
-        if re.search(rf"\b{re.escape(word)}\w*", text_lower):
-            date_str = next_weekday(word)
-            if date_str:
-                return date_str
-
-    dt = dateparser.parse(text, languages=["ru"])
-    if not dt:
-        return None
-    dt = dt.replace(tzinfo=None)
-    if dt.date() < datetime.now().date():
-        return None
-    return dt.strftime("%Y-%m-%d")
+    result = parse_date(text, datetime.now().date())
+    return result.strftime("%Y-%m-%d") if result else None
 
 
 async def normalize_time(text: str) -> Optional[str]:
-    """Получает время через YandexGPT и возвращает HH:MM или None."""
-    prompt = build_prompt(TIME_PROMPT.format(text=text))
+    """Возвращает время HH:MM (интервал HH:MM-HH:MM) или None.
+
+    Распространённые формы разбираются локально; YandexGPT спрашиваем,
+    только если локальный разбор не справился.
+    """
+    local = parse_time(text)
+    if local:
+        metrics.incr("time.local")
+        return local
+    metrics.incr("time.model")
+    prompt = prompt_cache.get("time").format(text=text)
     try:
-        result = await generate_text(prompt)
+        result = await within_budget(generate_text(prompt, call_type="time"), "")
     except Exception as e:
         logging.exception("Failed to parse time via GPT: %s", e)
         result = ""
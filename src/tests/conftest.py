@@ -0,0 +1,12 @@
+import sys
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset_gpt_breaker():
+    """Keep circuit breaker state from leaking between tests."""
+    gpt = sys.modules.get("bookingassistant.gpt")
+    if gpt is not None:
+        gpt.breaker.reset()
+    yield
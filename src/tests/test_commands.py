@@ -36,3 +36,36 @@ async def test_cancel_command():
         data["destination"].lower() == "москву"
         or data["destination"].lower() == "москва"
     )
+
+
+def test_history_parsing_skipped_during_booking_flow():
+    assert not parser.needs_history_parsing(
+        "покажи поездки", {"last_question": "Куда едем?"}
+    )
+    assert not parser.needs_history_parsing("Казань", {"extra_questions": ["time"]})
+
+
+def test_history_parsing_requires_keywords():
+    assert not parser.needs_history_parsing("Хочу в Казань завтра", {})
+    assert parser.needs_history_parsing("отмени поездку в Москву", {})
+    assert parser.needs_history_parsing("покажи мои поездки", {"origin": "Москва"})
+
+
+@pytest.mark.parametrize(
+    "text", ["Хочу забронировать билет в Казань", "Нужна поездка в Тверь", "заявка на завтра"]
+)
+def test_history_parsing_skips_new_bookings(text):
+    assert not parser.needs_history_parsing(text, {})
+
+
+@pytest.mark.parametrize("text", ["мои брони", "прошлые заявки", "последние поездки"])
+def test_history_parsing_accepts_history_phrases(text):
+    assert parser.needs_history_parsing(text, {})
+
+
+def test_intent_parsing_skips_obvious_confirmation():
+    assert not parser.needs_intent_parsing("да, всё верно", {"confirm": True})
+    assert not parser.needs_intent_parsing("нет", {"confirm": True})
+    assert parser.needs_intent_parsing("нет, в пятницу", {"confirm": True})
+    assert parser.needs_intent_parsing("да", {})
+    assert not parser.needs_intent_parsing("18:00", {"extra_questions": ["time"]})
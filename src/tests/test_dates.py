@@ -0,0 +1,113 @@
+import os
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+from bookingassistant import dates, metrics
+from bookingassistant.dates import parse_date
+
+TODAY = date(2025, 7, 28)  # понедельник
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("сегодня", date(2025, 7, 28)),
+        ("послезавтра из Казани", date(2025, 7, 30)),
+        ("через неделю", date(2025, 8, 4)),
+        ("через две недели", date(2025, 8, 11)),
+        ("через 3 дня", date(2025, 7, 31)),
+        ("через месяц", date(2025, 8, 28)),
+        ("5 авг", date(2025, 8, 5)),
+        ("пятого августа", date(2025, 8, 5)),
+        ("на двадцать первое сентября", date(2025, 9, 21)),
+        ("3-е мая", date(2026, 5, 3)),
+        ("05/08", date(2025, 8, 5)),
+        ("5.08", date(2025, 8, 5)),
+        ("05.08.2026", date(2026, 8, 5)),
+        ("2025-08-05", date(2025, 8, 5)),
+        ("10 числа", date(2025, 8, 10)),
+        ("в пятницу", date(2025, 8, 1)),
+        ("в понедельник", date(2025, 8, 4)),
+    ],
+)
+def test_native_grammar(text, expected):
+    assert parse_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("1 май", date(2026, 5, 1)),
+        ("9 мая", date(2026, 5, 9)),
+        ("в 10 мае", date(2026, 5, 10)),
+        ("5 мар.", date(2026, 3, 5)),
+        ("5 сен", date(2025, 9, 5)),
+        ("5 дек", date(2025, 12, 5)),
+    ],
+)
+def test_month_abbreviations(text, expected):
+    assert parse_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["Нас 2 маршрутки", "3 сена", "2 декора", "5 майонеза", "в 7 маячки"],
+)
+def test_month_abbreviations_inside_words(text):
+    assert dates.parse_date_native(text, TODAY) is None
+
+
+def test_words_like_months_skip_dateparser(monkeypatch):
+    def fail(text, today):
+        raise AssertionError("dateparser must not be used")
+
+    monkeypatch.setattr(dates, "_parse_with_dateparser", fail)
+    for text in ("еду на маршрутке", "сена нет", "красивый декор", "мой маяк"):
+        assert parse_date(text, TODAY) is None
+
+
+def test_past_dates_with_year_are_rejected():
+    assert parse_date("2024-08-05", TODAY) is None
+    assert parse_date("31.02", TODAY) is None
+
+
+def test_dateparser_not_called_without_date_words(monkeypatch):
+    metrics.reset()
+
+    def fail(text, today):
+        raise AssertionError("dateparser must not be used")
+
+    monkeypatch.setattr(dates, "_parse_with_dateparser", fail)
+    assert parse_date("хочу в Нижний Новгород на поезде", TODAY) is None
+    assert parse_date("завтра", TODAY) == date(2025, 7, 29)
+    assert metrics.snapshot("dates.") == {"dates.native": 1}
+
+
+def test_dateparser_is_last_resort(monkeypatch):
+    metrics.reset()
+    calls = []
+
+    def fake(text, today):
+        calls.append(text)
+        return date(2025, 12, 31)
+
+    monkeypatch.setattr(dates, "_parse_with_dateparser", fake)
+    assert parse_date("в конце следующей недели", TODAY) == date(2025, 12, 31)
+    assert calls and metrics.snapshot("dates.") == {"dates.fallback": 1}
+
+
+def test_dateparser_imported_lazily():
+    code = (
+        "import sys;"
+        "from bookingassistant.utils import normalize_date;"
+        "normalize_date('через неделю в Казань');"
+        "assert 'dateparser' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, env=os.environ)
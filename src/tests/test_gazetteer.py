@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+from bookingassistant import slot_editor
+from bookingassistant.fuzzy import distance, transliterate
+from bookingassistant.gazetteer import gazetteer
+
+
+@pytest.mark.parametrize(
+    "text, cities",
+    [
+        ("Хочу из Казани в Москву", ["Казань", "Москва"]),
+        ("еду в спб из мск", ["Санкт-Петербург", "Москва"]),
+        ("из Нижнего Новгорода в Питер", ["Нижний Новгород", "Санкт-Петербург"]),
+        ("в Ростов-на-Дону", ["Ростов-на-Дону"]),
+        ("в Набережные Челны", ["Набережные Челны"]),
+        ("из Омска", ["Омск"]),
+        ("из Орла в Ельцу", ["Орёл", "Елец"]),
+        ("под Череповцом", ["Череповец"]),
+        ("из Торжка", ["Торжок"]),
+        ("покажи мои поездки", []),
+    ],
+)
+def test_gazetteer_finds_inflected_forms_and_aliases(text, cities):
+    assert [match.city for match in gazetteer.find(text)] == cities
+
+
+def test_gazetteer_match_positions():
+    (match,) = gazetteer.find("в Нижнем Новгороде")
+    assert (match.start, match.end) == (2, 18)
+
+
+def test_gazetteer_canonical_name():
+    assert gazetteer.canonical("питере") == "Санкт-Петербург"
+    assert gazetteer.canonical("Ёбург") == "Екатеринбург"
+    assert gazetteer.canonical("Атлантида") is None
+
+
+def test_city_helpers_use_gazetteer():
+    assert slot_editor._city_in_message("Москва", "еду в мск")
+    assert not slot_editor._city_in_message("Москва", "еду в омск")
+    assert slot_editor._detect_city_role("Санкт-Петербург", "из питера") == "origin"
+    assert slot_editor._detect_city_role("Казань", "до Казани") == "destination"
+    # Cities missing from the gazetteer fall back to stem matching
+    assert slot_editor._detect_city_role("Кириши", "из Киришей") == "origin"
+
+
+def test_transliterate_and_distance():
+    assert transliterate("Yekaterinburg") == "екатеринбург"
+    assert transliterate("Nizhniy Novgorod") == "нижний новгород"
+    assert distance("казнаь", "казань") == 1
+    assert distance("екатеринбур", "екатеринбург", limit=0) == 1
+
+
+@pytest.mark.parametrize(
+    "name, city",
+    [
+        ("Moskva", "Москва"),
+        ("Екатеринбур", "Екатеринбург"),
+        ("Новосибриск", "Новосибирск"),
+        ("Tolyatti", "Тольятти"),
+        ("Saint Petersburg", "Санкт-Петербург"),
+    ],
+)
+def test_gazetteer_corrects_typos_and_latin(name, city):
+    corrected, confidence = gazetteer.correct(name)
+    assert corrected == city
+    assert 0.8 <= confidence <= 1.0
+
+
+def test_gazetteer_rejects_distant_names():
+    assert gazetteer.correct("Атлантида") is None
+    assert gazetteer.correct("Мск") == ("Москва", 1.0)
+
+
+@pytest.mark.asyncio
+async def test_update_slots_fixes_typos_without_model(monkeypatch):
+    async def fail_parse_slots(*args, **kwargs):
+        raise AssertionError("model should not be called")
+
+    monkeypatch.setattr(slot_editor, "parse_slots", fail_parse_slots)
+
+    slots, _ = await slot_editor.update_slots(1, "из Moskva в Екатеринбур", {})
+
+    assert slots["origin"] == "Москва"
+    assert slots["destination"] == "Екатеринбург"
+
+
+@pytest.mark.asyncio
+async def test_update_slots_normalises_model_city(monkeypatch):
+    async def fake_parse_slots(message, question=None, wanted=None):
+        return {"origin": None, "destination": "Питер", "date": None, "transport": None}
+
+    monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
+
+    slots, _ = await slot_editor.update_slots(1, "в северную столицу", {})
+
+    assert slots["destination"] == "Санкт-Петербург"
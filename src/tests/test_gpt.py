@@ -0,0 +1,401 @@
+import asyncio
+import os
+
+import aiohttp
+import pytest
+from aioresponses import aioresponses
+from yarl import URL
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+from bookingassistant import gpt, metrics, profiles
+
+
+def _payload(text: str) -> dict:
+    return {"result": {"alternatives": [{"message": {"text": text}}]}}
+
+
+@pytest.mark.asyncio
+async def test_generate_text_coalesces_identical_prompts():
+    metrics.reset()
+    with aioresponses() as m:
+        m.post(gpt.API_URL, payload=_payload("Куда едем?"))
+        results = await asyncio.gather(
+            *(gpt.generate_text("same prompt") for _ in range(3))
+        )
+        assert len(m.requests[("POST", URL(gpt.API_URL))]) == 1
+    assert results == ["Куда едем?"] * 3
+    assert metrics.snapshot("gpt.coalesced") == {"gpt.coalesced": 2}
+    assert not gpt._inflight
+
+
+@pytest.mark.asyncio
+async def test_generate_text_without_coalescing():
+    with aioresponses() as m:
+        m.post(gpt.API_URL, payload=_payload("a"))
+        m.post(gpt.API_URL, payload=_payload("b"))
+        results = await asyncio.gather(
+            gpt.generate_text("p", coalesce=False),
+            gpt.generate_text("p", coalesce=False),
+        )
+    assert sorted(results) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_within_budget_returns_fallback_and_cancels_late_call():
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "late"
+
+    with gpt.update_budget(0.05):
+        assert await gpt.within_budget(slow(), "fallback") == "fallback"
+        assert gpt.remaining_budget() == 0
+        assert await gpt.within_budget(slow(), "fallback") == "fallback"
+    assert cancelled.is_set()
+    assert gpt.remaining_budget() is None
+
+
+@pytest.mark.asyncio
+async def test_shared_call_cancelled_when_last_waiter_gives_up(monkeypatch):
+    async def blocked_request(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(gpt, "request_completion", blocked_request)
+    with gpt.update_budget(0.05):
+        assert await gpt.within_budget(gpt.generate_text("p"), "") == ""
+    await asyncio.sleep(0)
+    assert not gpt._inflight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_breaker_transitions():
+    clock = FakeClock()
+    breaker = gpt.CircuitBreaker(
+        failure_threshold=2, slow_call=1.0, cooldown=10, probes=2, clock=clock
+    )
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_success(5.0)  # slow answer counts as a failure
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    probes = [breaker.allow(), breaker.allow()]
+    assert all(probes)
+    assert not breaker.allow()
+    for permit in probes:
+        breaker.record_success(0.1, permit)
+    assert breaker.snapshot()["state"] == "closed"
+
+
+def test_circuit_breaker_reopens_on_failed_probe():
+    clock = FakeClock()
+    breaker = gpt.CircuitBreaker(
+        failure_threshold=1, slow_call=1.0, cooldown=10, probes=1, clock=clock
+    )
+    breaker.record_failure()
+    clock.now = 10
+    permit = breaker.allow()
+    assert permit
+    breaker.record_failure(permit)
+    assert breaker.state == "open"
+
+
+def test_circuit_breaker_counts_only_probes_when_half_open():
+    clock = FakeClock()
+    breaker = gpt.CircuitBreaker(
+        failure_threshold=1, slow_call=1.0, cooldown=10, probes=1, clock=clock
+    )
+    early = breaker.allow()
+    breaker.record_failure()
+    clock.now = 10
+    probe = breaker.allow()
+    assert probe and not breaker.allow()
+    # A call admitted while closed neither frees the probe slot nor decides
+    breaker.record_success(0.1, early)
+    breaker.record_failure(early)
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success(0.1, probe)
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_budget_cancellations_do_not_trip_breaker():
+    async def slow(url, **kwargs):
+        await asyncio.sleep(1)
+
+    with aioresponses() as m:
+        m.post(gpt.API_URL, callback=slow, repeat=True)
+        for _ in range(gpt.breaker.failure_threshold + 1):
+            with gpt.update_budget(0.02):
+                call = gpt.request_completion([], call_type="question")
+                assert await gpt.within_budget(call, None) is None
+    assert gpt.breaker.state == "closed"
+    assert gpt.breaker.snapshot()["failures"] == 0
+
+
+def test_cancelled_slow_call_counts_as_failure():
+    breaker = gpt.CircuitBreaker(
+        failure_threshold=1, slow_call=1.0, cooldown=10, probes=1, clock=FakeClock()
+    )
+    breaker.record_cancelled(0.5, breaker.allow())
+    assert breaker.state == "closed"
+    breaker.record_cancelled(1.5, breaker.allow())
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_does_not_wait_for_limiter(monkeypatch):
+    bucket = gpt.TokenBucket(rate=0.001, burst=1, max_queue=10)
+    await bucket.acquire()
+    monkeypatch.setattr(gpt, "limiter", bucket)
+    for _ in range(gpt.breaker.failure_threshold):
+        gpt.breaker.record_failure()
+    with aioresponses() as m:
+        assert await asyncio.wait_for(gpt.generate_text("p"), 1) == ""
+        assert not m.requests
+    assert not bucket._waiters
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_skips_network():
+    for _ in range(gpt.breaker.failure_threshold):
+        gpt.breaker.record_failure()
+    with aioresponses() as m:
+        assert await gpt.generate_text("p") == ""
+        assert not m.requests
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_serves_high_priority_first():
+    bucket = gpt.TokenBucket(rate=100, burst=1, max_queue=10)
+    await bucket.acquire()
+    order = []
+
+    async def call(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    await asyncio.gather(
+        call("question", gpt.PRIORITY_LOW),
+        call("slots", gpt.PRIORITY_HIGH),
+        call("time", gpt.PRIORITY_NORMAL),
+    )
+    assert order == ["slots", "time", "question"]
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_drops_low_priority_when_full():
+    bucket = gpt.TokenBucket(rate=50, burst=1, max_queue=1)
+    await bucket.acquire()
+    low = asyncio.ensure_future(bucket.acquire(gpt.PRIORITY_LOW))
+    await asyncio.sleep(0)
+    with pytest.raises(gpt.RateLimitExceeded):
+        await bucket.acquire(gpt.PRIORITY_LOW)
+    # A high-priority call evicts the queued low-priority one
+    await bucket.acquire(gpt.PRIORITY_HIGH)
+    with pytest.raises(gpt.RateLimitExceeded):
+        await low
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_queue_is_bounded_for_every_priority():
+    bucket = gpt.TokenBucket(rate=50, burst=1, max_queue=2)
+    await bucket.acquire()
+    waiting = [
+        asyncio.ensure_future(bucket.acquire(gpt.PRIORITY_HIGH)) for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+    with pytest.raises(gpt.RateLimitExceeded):
+        await bucket.acquire(gpt.PRIORITY_HIGH)
+    assert len(bucket._waiters) == 2
+    await asyncio.gather(*waiting)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_evicts_cancelled_waiter():
+    bucket = gpt.TokenBucket(rate=50, burst=1, max_queue=1)
+    await bucket.acquire()
+    low = asyncio.ensure_future(bucket.acquire(gpt.PRIORITY_LOW))
+    await asyncio.sleep(0)
+    # The waiter's future is cancelled but still queued until its task runs
+    low.cancel()
+    await bucket.acquire(gpt.PRIORITY_HIGH)
+    with pytest.raises(asyncio.CancelledError):
+        await low
+
+
+@pytest.mark.asyncio
+async def test_request_completion_retries_transient_errors(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(gpt, "GPT_RETRY_BASE_DELAY", 0.001)
+    with aioresponses() as m:
+        m.post(gpt.API_URL, status=503)
+        m.post(gpt.API_URL, status=429, headers={"Retry-After": "0"})
+        m.post(gpt.API_URL, payload=_payload("ok"))
+        text = await gpt.request_completion([], call_type="slots")
+    assert text == "ok"
+    assert metrics.snapshot("gpt.retries.") == {"gpt.retries.slots": 2}
+
+
+@pytest.mark.asyncio
+async def test_request_completion_does_not_retry_client_errors():
+    with aioresponses() as m:
+        m.post(gpt.API_URL, status=400)
+        m.post(gpt.API_URL, payload=_payload("ok"))
+        with pytest.raises(aiohttp.ClientResponseError):
+            await gpt.request_completion([], call_type="slots")
+
+
+@pytest.mark.asyncio
+async def test_retry_respects_update_budget():
+    with aioresponses() as m:
+        m.post(gpt.API_URL, status=503, headers={"Retry-After": "1"})
+        m.post(gpt.API_URL, payload=_payload("ok"))
+        with gpt.update_budget(0.5):
+            with pytest.raises(aiohttp.ClientResponseError):
+                await gpt.request_completion([], call_type="yesno")
+
+
+@pytest.mark.asyncio
+async def test_session_is_reused_and_closed():
+    session = gpt.get_session()
+    assert gpt.get_session() is session
+    await gpt.close_session()
+    assert session.closed
+    assert gpt._session is None
+
+
+def test_session_from_finished_loop_is_released():
+    async def open_session():
+        return gpt.get_session()
+
+    stale = asyncio.run(open_session())
+    fresh = asyncio.run(open_session())
+    try:
+        assert stale.closed
+        assert fresh is not stale
+    finally:
+        asyncio.run(gpt.close_session())
+
+
+def test_retry_after_http_date():
+    error = aiohttp.ClientResponseError(
+        None, (), status=503, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    )
+    assert gpt._retry_after(error) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_stream_text_yields_growing_text():
+    lines = [
+        '{"result": {"alternatives": [{"message": {"text": "Всё"}}]}}',
+        '{"result": {"alternatives": [{"message": {"text": "Всё верно?"}}]}}',
+    ]
+    with aioresponses() as m:
+        m.post(gpt.API_URL, body="\n".join(lines) + "\n")
+        chunks = [text async for text in gpt.stream_text("p")]
+    assert chunks == ["Всё", "Всё верно?"]
+
+
+@pytest.mark.asyncio
+async def test_stream_text_skips_repeated_text():
+    lines = [
+        '{"result": {"alternatives": [{"message": {"text": "Всё"}}]}}',
+        '{"result": {"alternatives": [{"message": {"text": "Всё"}}]}}',
+        '{"result": {"alternatives": [{"message": {"text": "Всё верно?"}}]}}',
+        '{"result": {"alternatives": [{"message": {"text": "Всё верно?"}}]}}',
+    ]
+    with aioresponses() as m:
+        m.post(gpt.API_URL, body="\n".join(lines) + "\n")
+        chunks = [text async for text in gpt.stream_text("p")]
+    assert chunks == ["Всё", "Всё верно?"]
+
+
+@pytest.mark.asyncio
+async def test_stream_text_yields_nothing_on_error():
+    with aioresponses() as m:
+        m.post(gpt.API_URL, status=500)
+        chunks = [text async for text in gpt.stream_text("p")]
+    assert chunks == []
+
+
+def test_profile_overrides():
+    loaded = profiles.load_profiles(
+        '{"slots": {"max_tokens": 300}, "custom": {"model": "yandexgpt"}}'
+    )
+    assert loaded["slots"].max_tokens == 300
+    assert loaded["slots"].temperature == 0.2
+    assert loaded["custom"].model_uri.endswith("/yandexgpt")
+    with pytest.raises(RuntimeError):
+        profiles.load_profiles('{"slots": {"tokens": 1}}')
+
+
+@pytest.mark.parametrize("overrides", ['["slots"]', '"slots"', '{"slots": 300}'])
+def test_profile_overrides_must_be_objects(overrides):
+    with pytest.raises(RuntimeError, match="GPT_PROFILES"):
+        profiles.load_profiles(overrides)
+
+
+@pytest.mark.asyncio
+async def test_request_uses_call_profile(monkeypatch):
+    monkeypatch.setitem(
+        profiles.PROFILES,
+        "yesno",
+        profiles.CallProfile(model="gpt://f/fast", max_tokens=5, temperature=0),
+    )
+    with aioresponses() as m:
+        m.post(gpt.API_URL, payload=_payload("ok"))
+        await gpt.request_completion([], call_type="yesno")
+        (call,) = m.requests[("POST", URL(gpt.API_URL))]
+    payload = call.kwargs["json"]
+    assert payload["modelUri"] == "gpt://f/fast"
+    assert payload["completionOptions"]["maxTokens"] == 5
+
+
+@pytest.mark.asyncio
+async def test_calls_are_accounted_with_tokens_and_outcome():
+    metrics.reset()
+    body = _payload("ok")
+    body["result"]["usage"] = {"inputTextTokens": "12", "completionTokens": "3"}
+    with aioresponses() as m:
+        m.post(gpt.API_URL, payload=body)
+        m.post(gpt.API_URL, status=400)
+        await gpt.request_completion([], call_type="history")
+        with pytest.raises(aiohttp.ClientResponseError):
+            await gpt.request_completion([], call_type="history")
+    for _ in range(10):
+        gpt.breaker.record_failure()
+    with pytest.raises(gpt.CircuitOpenError):
+        await gpt.request_completion([], call_type="history")
+    report = metrics.call_report()["history"]
+    assert report["calls"] == 3
+    assert report["outcomes"] == {"ok": 1, "http_error": 1, "fallback": 1}
+    assert report["input_tokens"] == 12
+    assert report["output_tokens"] == 3
+
+
+def test_call_stats_percentiles():
+    stats = metrics.CallStats()
+    for ms in range(1, 101):
+        stats.latencies.append(ms / 1000)
+    assert stats.percentile(50) == 0.05
+    assert stats.percentile(99) == 0.099
+    assert metrics.CallStats().percentile(99) == 0.0
@@ -0,0 +1,64 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+os.environ["TELEGRAM_BOT_TOKEN"] = "123:abc"
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+import importlib
+import bookingassistant.config as config
+
+importlib.reload(config)
+import bookingassistant.main as main
+from bookingassistant.state_storage import UserState
+
+
+@pytest.fixture
+def combined(monkeypatch):
+    monkeypatch.setattr(main, "COMBINED_PARSING", True)
+    monkeypatch.setattr(main, "greet_if_needed", AsyncMock())
+    cancel_trip = MagicMock()
+    monkeypatch.setattr(main, "cancel_trip", cancel_trip)
+    monkeypatch.setattr(
+        main,
+        "get_last_trips",
+        lambda uid, limit=5: [
+            {"id": 1, "destination": "Казань", "status": "active"},
+        ],
+    )
+    return cancel_trip
+
+
+def _message(text, uid=7):
+    return SimpleNamespace(
+        text=text, from_user=SimpleNamespace(id=uid), answer=AsyncMock()
+    )
+
+
+@pytest.mark.asyncio
+async def test_combined_cancel_during_confirmation_drops_draft(combined, monkeypatch):
+    intent = {"action": "cancel", "destination": "Казань", "limit": 5}
+    monkeypatch.setattr(main, "parse_message", AsyncMock(return_value=intent))
+    draft = {"origin": "Москва", "destination": "Казань", "confirm": True}
+    state = UserState(7, draft)
+    message = _message("отмени, не поеду в Казань")
+
+    await main.handle_message(message, state)
+
+    combined.assert_not_called()
+    message.answer.assert_called_once_with(main.BOOKING_CANCELLED_MESSAGE)
+    assert not state
+
+
+@pytest.mark.asyncio
+async def test_combined_cancel_outside_booking_cancels_trip(combined, monkeypatch):
+    intent = {"action": "cancel", "destination": "Казань", "limit": 5}
+    monkeypatch.setattr(main, "parse_message", AsyncMock(return_value=intent))
+    message = _message("отмени поездку в Казань")
+
+    await main.handle_message(message, UserState(7))
+
+    combined.assert_called_once_with(1)
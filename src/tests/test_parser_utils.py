@@ -20,6 +20,51 @@ def test_extract_json_accepts_empty_object_with_tail():
     assert parser._extract_json(text) == '{}'
 
 
+def test_extract_json_ignores_braces_in_strings():
+    text = 'Ответ: {"note": "}{", "nested": {"a": 1}} конец'
+    assert json.loads(parser._extract_json(text)) == {
+        "note": "}{",
+        "nested": {"a": 1},
+    }
+
+
+def test_extract_json_skips_stray_braces():
+    text = '{{{ {"to": "Москва"}'
+    assert parser._extract_json(text) == '{"to": "Москва"}'
+
+
+def test_extract_json_skips_unclosed_prefix():
+    text = '{"note": {"to": "Москва"}'
+    assert parser._extract_json(text) == '{"to": "Москва"}'
+
+
+def test_extract_json_keeps_object_inside_broken_one():
+    text = '{"a": {"to": "Москва"} oops}'
+    assert parser._extract_json(text) == '{"to": "Москва"}'
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"a" ' * 8000,
+        '{"a": ' * 900,
+        '{"a": ' * 5000 + "1" + "}" * 5000,
+    ],
+)
+def test_find_json_survives_adversarial_input(text):
+    assert parser._find_json(text) is None
+
+
+def test_parse_json_handles_fenced_answer():
+    text = '```json\n{"from": "Казань"}\n```'
+    assert parser._parse_json(text) == {"from": "Казань"}
+
+
+def test_parse_json_raises_without_object():
+    with pytest.raises(json.JSONDecodeError):
+        parser._parse_json("нет данных")
+
+
 @pytest.mark.asyncio
 async def test_parse_history_request_handles_messy_answer():
     answer_text = '{"": 1}\n{"action": "show", "limit": "", "destination": ""}'
@@ -41,3 +86,57 @@ async def test_parse_history_request_empty_json_with_text():
         m.post(parser.API_URL, payload=payload)
         data = await parser.parse_history_request("покажи поездки")
     assert data["action"] == "show"
+
+
+@pytest.mark.asyncio
+async def test_parse_message_returns_intent_and_slots():
+    answer_text = (
+        '{"action": "", "limit": "", "destination": "Москва", '
+        '"origin": "Казань", "date": "2025-08-05", "transport": "train"}'
+    )
+    payload = {"result": {"alternatives": [{"message": {"text": answer_text}}]}}
+    with aioresponses() as m:
+        m.post(parser.API_URL, payload=payload)
+        data = await parser.parse_message("из Казани в Москву на поезде")
+    assert data["action"] == ""
+    assert data["limit"] == 5
+    assert data["origin"] == "Казань"
+    assert data["destination"] == "Москва"
+    assert data["transport"] == "train"
+
+
+@pytest.mark.asyncio
+async def test_parse_message_falls_back_to_heuristic():
+    with aioresponses() as m:
+        m.post(parser.API_URL, status=500)
+        data = await parser.parse_message("покажи последние 2 поездки")
+    assert data["action"] == "show"
+    assert data["limit"] == 2
+    assert data["origin"] is None
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Да!", "yes"),
+        ("да, спасибо", "yes"),
+        ("Всё верно.", "yes"),
+        ("👍", "yes"),
+        ("нет(", "no"),
+        ("Не надо", "no"),
+        ("👎👎", "no"),
+        ("да нет, наверное", None),
+        ("а можно завтра?", None),
+    ],
+)
+def test_classify_yes_no(text, expected):
+    assert parser._classify_yes_no(text) == expected
+
+
+@pytest.mark.asyncio
+async def test_parse_yes_no_skips_api_for_obvious_answer():
+    parser.metrics.reset()
+    with aioresponses() as m:
+        assert await parser.parse_yes_no("ок 👍") == "yes"
+        assert not m.requests
+    assert parser.metrics.snapshot("yesno.") == {"yesno.local": 1}
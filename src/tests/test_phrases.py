@@ -0,0 +1,46 @@
+import os
+
+import pytest
+from aioresponses import aioresponses
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+from bookingassistant import phrases
+from bookingassistant.gpt import API_URL
+
+
+def _payload(text: str) -> dict:
+    return {"result": {"alternatives": [{"message": {"text": text}}]}}
+
+
+def test_valid_template():
+    assert phrases._valid_template("{origin} → {destination}, {date}, {transport}?")
+    assert not phrases._valid_template("{origin} → {destination}?")
+    assert not phrases._valid_template("{origin} {destination} {date} {transport} {x}")
+
+
+@pytest.mark.asyncio
+async def test_refresh_fills_pool():
+    pool = phrases.PhrasePool(2)
+    template = "Едем {transport} из {origin} в {destination} {date}?"
+    with aioresponses() as m:
+        m.post(API_URL, payload=_payload(template), repeat=True)
+        await pool.refresh()
+    assert pool.question("date") == template
+    text = pool.confirmation(
+        {"origin": "Москва", "destination": "Казань", "date": "2025-08-05", "transport": "bus"}
+    )
+    assert text == "Едем автобус из Москва в Казань 2025-08-05?"
+
+
+@pytest.mark.asyncio
+async def test_refresh_keeps_old_variants_on_failure():
+    pool = phrases.PhrasePool(1)
+    pool.questions["date"] = ["Когда едем?"]
+    with aioresponses() as m:
+        m.post(API_URL, status=500, repeat=True)
+        await pool.refresh()
+    assert pool.question("date") == "Когда едем?"
+    assert pool.confirmation({}) is None
@@ -0,0 +1,41 @@
+import os
+from datetime import datetime
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+from bookingassistant.prompts import BASE_PROMPT, PromptCache, estimate_tokens
+
+
+def test_prompt_cache_rebuilds_at_day_boundary():
+    now = datetime(2025, 8, 4, 23, 59, 59)
+    cache = PromptCache(clock=lambda: now)
+    before = cache.get("slots")
+    assert before.startswith(BASE_PROMPT.strip())
+    assert "2025-08-04 понедельник" in before
+    assert cache.get("slots") is before
+
+    now = datetime(2025, 8, 5, 0, 0, 0)
+    after = cache.get("slots")
+    assert "2025-08-05 вторник" in after
+    assert "2025-08-05" in cache.get("intent")
+
+
+def test_prompt_cache_keeps_format_fields():
+    cache = PromptCache()
+    prompt = cache.get("yesno").format(text="да")
+    assert "Текст: да" in prompt
+    assert '{"result": "yes/no/unknown"}' in prompt
+
+
+def test_compact_slots_prompt_is_smaller():
+    full = PromptCache().sizes()
+    compact = PromptCache(compact=True).sizes()
+    assert compact["slots"] < full["slots"]
+    assert compact["history"] == full["history"]
+    assert "{today_date}" not in PromptCache(compact=True).get("slots")
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('Верни JSON: {"a": 1}') == 10
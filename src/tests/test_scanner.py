@@ -0,0 +1,40 @@
+from bookingassistant.scanner import scan_message
+
+
+def test_single_scan_finds_all_hits():
+    scan = scan_message("В пт. из Москвы поездом, 05.08 или 2025-08-06, завтра")
+    kinds = [(hit.kind, hit.value) for hit in scan.hits]
+    assert kinds == [
+        ("weekday", 4),
+        ("transport", "train"),
+        ("date", "05.08"),
+        ("date", "2025-08-06"),
+        ("relative", 1),
+    ]
+    assert scan.weekday == 4
+    assert scan.transport == "train"
+    assert scan.has_date
+
+
+def test_weekday_forms_and_abbreviations():
+    assert scan_message("в среду").weekday == 2
+    assert scan_message("к воскресенью").weekday == 6
+    assert scan_message("сб").weekday == 5
+    # Abbreviations match only whole words, stems only real weekday forms
+    assert scan_message("срочно, среди недели").weekday is None
+    assert scan_message("четыре билета").weekday is None
+
+
+def test_tokens_keep_original_text_and_positions():
+    scan = scan_message("Из Твери в Сочи")
+    assert [(t.text, t.low, t.start) for t in scan.tokens] == [
+        ("Из", "из", 0),
+        ("Твери", "твери", 3),
+        ("в", "в", 9),
+        ("Сочи", "сочи", 11),
+    ]
+    assert scan.covers(3) is False
+
+
+def test_scan_is_cached():
+    assert scan_message("завтра в Казань") is scan_message("завтра в Казань")
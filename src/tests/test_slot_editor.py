@@ -1,4 +1,6 @@
+import datetime
 import os
+
 import pytest
 
 # Prevent config module from raising missing environment errors during import
@@ -13,7 +15,7 @@ from bookingassistant import slot_editor
 async def test_update_slots_ignores_hallucinations(monkeypatch):
     session = {42: {"origin": None, "destination": None, "date": None, "transport": None}}
 
-    async def fake_parse_slots(message: str, question: str | None = None):
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
         return {
             "origin": "Москва",
             "destination": "Санкт-Петербург",
@@ -33,7 +35,7 @@ async def test_update_slots_ignores_hallucinations(monkeypatch):
 async def test_update_slots_accepts_city_abbreviation(monkeypatch):
     session = {1: {"origin": None, "destination": None, "date": None, "transport": None}}
 
-    async def fake_parse_slots(message: str, question: str | None = None):
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
         return {"origin": None, "destination": "Москва", "date": None, "transport": None}
 
     monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
@@ -48,7 +50,7 @@ async def test_update_slots_accepts_city_abbreviation(monkeypatch):
 async def test_update_slots_reassigns_city_on_mismatch(monkeypatch):
     session = {1: {"origin": None, "destination": None, "date": None, "transport": None}}
 
-    async def fake_parse_slots(message: str, question: str | None = None):
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
         return {"origin": "Москва", "destination": None, "date": None, "transport": None}
 
     monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
@@ -65,10 +67,10 @@ async def test_update_slots_reassigns_city_on_mismatch(monkeypatch):
 
 
 @pytest.mark.asyncio
-async def test_update_slots_preserves_parsed_date(monkeypatch):
+async def test_update_slots_resolves_relative_date_locally(monkeypatch):
     session = {1: {"origin": None, "destination": None, "date": None, "transport": None}}
 
-    async def fake_parse_slots(message: str, question: str | None = None):
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
         return {"origin": "Москва", "destination": "Москва", "date": "2025-01-01", "transport": None}
 
     monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
@@ -78,17 +80,32 @@ async def test_update_slots_preserves_parsed_date(monkeypatch):
     assert slots == {
         "origin": None,
         "destination": "Москва",
-        "date": "2025-01-01",
+        "date": (datetime.date.today() + datetime.timedelta(days=1)).isoformat(),
         "transport": None,
     }
     assert changed == {}
 
 
+@pytest.mark.asyncio
+async def test_update_slots_preserves_parsed_date(monkeypatch):
+    session = {1: {"origin": None, "destination": None, "date": None, "transport": None}}
+
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
+        return {"origin": None, "destination": "Москва", "date": "2025-01-01", "transport": None}
+
+    monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
+    monkeypatch.setattr(slot_editor, "normalize_date", lambda text: None)
+
+    slots, _ = await slot_editor.update_slots(1, "В москву в день зарплаты, 31.02", session)
+
+    assert slots["date"] == "2025-01-01"
+
+
 @pytest.mark.asyncio
 async def test_update_slots_drops_hallucinated_date(monkeypatch):
     session = {1: {"origin": None, "destination": None, "date": None, "transport": None}}
 
-    async def fake_parse_slots(message: str, question: str | None = None):
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
         return {"origin": None, "destination": "Москва", "date": "2025-01-01", "transport": None}
 
     monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
@@ -102,7 +119,7 @@ async def test_update_slots_drops_hallucinated_date(monkeypatch):
 async def test_update_slots_converts_placeholder_strings(monkeypatch):
     session = {1: {"origin": "Питер", "destination": None, "date": None, "transport": None}}
 
-    async def fake_parse_slots(message: str, question: str | None = None):
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
         return {
             "origin": "пусто",
             "destination": "Москва",
@@ -127,7 +144,7 @@ async def test_update_slots_converts_placeholder_strings(monkeypatch):
 async def test_update_slots_respects_question_context_for_origin(monkeypatch):
     session = {1: {"origin": None, "destination": None, "date": None, "transport": None}}
 
-    async def fake_parse_slots(message: str, question: str | None = None):
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
         return {"origin": None, "destination": "Казань", "date": None, "transport": None}
 
     monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
@@ -144,7 +161,7 @@ async def test_update_slots_respects_question_context_for_origin(monkeypatch):
 async def test_update_slots_respects_question_context_for_destination(monkeypatch):
     session = {1: {"origin": None, "destination": None, "date": None, "transport": None}}
 
-    async def fake_parse_slots(message: str, question: str | None = None):
+    async def fake_parse_slots(message: str, question: str | None = None, wanted=None):
         return {"origin": "Казань", "destination": None, "date": None, "transport": None}
 
     monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
@@ -155,3 +172,54 @@ async def test_update_slots_respects_question_context_for_destination(monkeypatc
 
     assert slots == {"origin": None, "destination": "Казань", "date": None, "transport": None}
     assert changed == {}
+
+
+@pytest.mark.asyncio
+async def test_update_slots_skips_model_when_rules_resolve(monkeypatch):
+    from bookingassistant import metrics
+
+    metrics.reset()
+    session = {}
+
+    async def fail_parse_slots(*args, **kwargs):
+        raise AssertionError("model should not be called")
+
+    monkeypatch.setattr(slot_editor, "parse_slots", fail_parse_slots)
+
+    slots, _ = await slot_editor.update_slots(
+        1, "из Казани в Москву на поезде", session
+    )
+
+    assert slots == {
+        "origin": "Казань",
+        "destination": "Москва",
+        "date": None,
+        "transport": "train",
+    }
+    assert metrics.snapshot("slots.") == {"slots.local": 1}
+
+
+@pytest.mark.asyncio
+async def test_update_slots_asks_model_only_for_unresolved(monkeypatch):
+    from bookingassistant import metrics
+
+    metrics.reset()
+    session = {}
+    calls = []
+
+    async def fake_parse_slots(message, question=None, wanted=None):
+        calls.append(wanted)
+        return {"origin": "Москва", "destination": "Кириши", "date": None, "transport": "bus"}
+
+    monkeypatch.setattr(slot_editor, "parse_slots", fake_parse_slots)
+
+    slots, _ = await slot_editor.update_slots(1, "в Кириши на поезде", session)
+
+    assert calls == [["destination", "origin"]]
+    assert slots == {
+        "origin": None,
+        "destination": "Кириши",
+        "date": None,
+        "transport": "train",
+    }
+    assert metrics.snapshot("slots.") == {"slots.model": 1}
@@ -0,0 +1,109 @@
+import pytest
+
+from bookingassistant.state_backends import (
+    MemoryBackend,
+    PostgresBackend,
+    SQLiteBackend,
+    StateBackend,
+    create_backend,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend_factory(request, tmp_path):
+    def make(ttl=0, clock=None):
+        kwargs = {"clock": clock} if clock else {}
+        if request.param == "memory":
+            backend = MemoryBackend(ttl, **kwargs)
+        else:
+            backend = SQLiteBackend(str(tmp_path / "state.db"), ttl, **kwargs)
+        return backend
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_write_load_and_delete(backend_factory):
+    backend = backend_factory()
+    await backend.write({1: {"origin": "Москва"}, 2: {"date": None}}, [])
+    assert await backend.load(1) == {"origin": "Москва"}
+    await backend.write({1: {"origin": "Казань"}}, [2])
+    assert await backend.load(1) == {"origin": "Казань"}
+    assert await backend.load(2) is None
+    assert await backend.sweep() == 0  # without TTL nothing expires
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_expired_states_are_hidden_and_swept(backend_factory):
+    now = [1000.0]
+    backend = backend_factory(ttl=60, clock=lambda: now[0])
+    await backend.write({1: {"a": 1}}, [])
+    now[0] += 30
+    await backend.write({2: {"b": 2}}, [])
+    now[0] += 40  # state 1 is 70 s old, state 2 is 40 s old
+    assert await backend.load(1) is None
+    assert await backend.load(2) == {"b": 2}
+    assert await backend.sweep() == 1
+    assert await backend.load(2) == {"b": 2}
+    await backend.close()
+
+
+def test_backend_selected_by_url_scheme():
+    assert isinstance(create_backend("memory://"), MemoryBackend)
+    sqlite = create_backend("sqlite:///state.db", ttl=10)
+    assert isinstance(sqlite, SQLiteBackend)
+    assert sqlite.path == "state.db" and sqlite.ttl == 10
+    assert create_backend("sqlite:////var/lib/bot/state.db").path == "/var/lib/bot/state.db"
+    assert isinstance(create_backend("postgresql://u:p@db/bot"), PostgresBackend)
+    with pytest.raises(ValueError):
+        create_backend("redis://localhost")
+
+
+def test_incomplete_backend_fails_on_construction():
+    class NoSweep(StateBackend):
+        async def load(self, user_id):
+            return None
+
+        async def write(self, upserts, deletes):
+            pass
+
+    with pytest.raises(TypeError):
+        NoSweep()
+
+
+class _FakeConnection:
+    def __init__(self, status):
+        self.status = status
+        self.calls = []
+
+    async def execute(self, query, *args):
+        self.calls.append(args)
+        return self.status
+
+
+class _FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Acquire()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status, removed", [("DELETE 3", 3), ("DELETE", 0), ("", 0)])
+async def test_postgres_sweep_uses_clock_and_parses_status(status, removed):
+    conn = _FakeConnection(status)
+    backend = PostgresBackend("postgresql://db/bot", ttl=60, clock=lambda: 1000.0)
+    backend._pool = _FakePool(conn)
+    assert await backend.sweep() == removed
+    assert conn.calls == [(940.0,)]
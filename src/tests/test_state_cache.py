@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+from bookingassistant import state_storage
+from bookingassistant.state_storage import StateCache, StateStorageError, UserState
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Replace the Postgres table with a dict and record round trips."""
+    rows = {}
+    calls = {"load": 0, "write": 0}
+
+    async def load(user_id):
+        calls["load"] += 1
+        return rows.get(user_id)
+
+    async def write(upserts, deletes):
+        calls["write"] += 1
+        rows.update(upserts)
+        for uid in deletes:
+            rows.pop(uid, None)
+
+    monkeypatch.setattr(state_storage, "_load", load)
+    monkeypatch.setattr(state_storage, "_write", write)
+    return rows, calls
+
+
+@pytest.mark.asyncio
+async def test_reads_are_served_from_memory(db):
+    rows, calls = db
+    rows[1] = {"step": "date"}
+    cache = StateCache(delay=60)
+    assert await cache.get(1) == {"step": "date"}
+    assert await cache.get(1) == {"step": "date"}
+    assert calls["load"] == 1
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched_until_flush(db):
+    rows, calls = db
+    cache = StateCache(delay=60)
+    await cache.set(1, {"a": 1})
+    await cache.set(1, {"a": 2})
+    await cache.set(2, {"b": 1})
+    assert rows == {} and cache.dirty == 2
+    assert await cache.get(1) == {"a": 2}
+    await cache.close()
+    assert rows == {1: {"a": 2}, 2: {"b": 1}}
+    assert calls == {"load": 0, "write": 1}
+
+
+@pytest.mark.asyncio
+async def test_returned_state_is_a_copy(db):
+    cache = StateCache(delay=60)
+    state = {"slots": {"origin": None}}
+    await cache.set(1, state)
+    state["slots"]["origin"] = "Москва"
+    loaded = await cache.get(1)
+    loaded["slots"]["origin"] = "Казань"
+    assert await cache.get(1) == {"slots": {"origin": None}}
+
+
+@pytest.mark.asyncio
+async def test_delete_is_written_behind(db):
+    rows, _ = db
+    rows[1] = {"a": 1}
+    cache = StateCache(delay=60)
+    await cache.set(1, None)
+    assert await cache.get(1) is None
+    assert 1 in rows
+    await cache.flush()
+    assert rows == {}
+
+
+@pytest.mark.asyncio
+async def test_flush_after_delay(db):
+    rows, _ = db
+    cache = StateCache(delay=0.01)
+    await cache.set(1, {"a": 1})
+    await asyncio.sleep(0.05)
+    assert rows == {1: {"a": 1}}
+
+
+@pytest.mark.asyncio
+async def test_lru_and_ttl_eviction(db):
+    rows, calls = db
+    now = [0.0]
+    cache = StateCache(size=2, ttl=10, delay=60, clock=lambda: now[0])
+    for uid in (1, 2, 3):
+        await cache.set(uid, {"uid": uid})
+    # Unwritten states are never dropped
+    assert len(cache) == 3
+    await cache.flush()
+    assert len(cache) == 2
+    assert await cache.get(1) == {"uid": 1}  # reloaded from the table
+    assert calls["load"] == 1
+    now[0] = 11
+    await cache.get(1)
+    assert calls["load"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_changes(db, monkeypatch):
+    rows, _ = db
+    cache = StateCache(delay=60)
+    await cache.set(1, {"a": 1})
+
+    async def broken(upserts, deletes):
+        raise OSError("connection refused")
+
+    real = state_storage._write
+    monkeypatch.setattr(state_storage, "_write", broken)
+    with pytest.raises(StateStorageError):
+        await cache.flush()
+    assert cache.dirty == 1
+    monkeypatch.setattr(state_storage, "_write", real)
+    await cache.flush()
+    assert rows == {1: {"a": 1}}
+
+
+@pytest.mark.asyncio
+async def test_user_state_commits_once_and_only_changes(db, monkeypatch):
+    rows, calls = db
+    monkeypatch.setattr(state_storage, "cache", StateCache(delay=60))
+    rows[1] = {"extra_questions": ["time", "comment"]}
+
+    state = await UserState.load(1)
+    assert await state.commit() is False  # untouched state is not written
+
+    state["extra_questions"].pop(0)
+    state["time"] = "08:00"
+    state["time"] = "09:00"
+    assert await state.commit() is True
+    await state_storage.flush()
+    assert rows[1] == {"extra_questions": ["comment"], "time": "09:00"}
+    assert calls["write"] == 1
+
+
+@pytest.mark.asyncio
+async def test_user_state_cleared_is_deleted(db, monkeypatch):
+    rows, _ = db
+    monkeypatch.setattr(state_storage, "cache", StateCache(delay=60))
+    rows[1] = {"confirm": True}
+    state = await UserState.load(1)
+    state.clear()
+    assert await state.commit() is True
+    await state_storage.flush()
+    assert rows == {}
+
+    fresh = await UserState.load(2)
+    assert await fresh.commit() is False
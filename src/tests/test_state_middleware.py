@@ -0,0 +1,103 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+os.environ["TELEGRAM_BOT_TOKEN"] = "123:abc"
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+import importlib
+import bookingassistant.config as config
+
+importlib.reload(config)
+import bookingassistant.main as main
+from bookingassistant import state_storage
+
+
+@pytest.fixture
+def table(monkeypatch):
+    rows = {}
+    writes = []
+
+    async def load(user_id):
+        return rows.get(user_id)
+
+    async def write(upserts, deletes):
+        writes.append((dict(upserts), list(deletes)))
+        rows.update(upserts)
+        for uid in deletes:
+            rows.pop(uid, None)
+
+    monkeypatch.setattr(state_storage, "_load", load)
+    monkeypatch.setattr(state_storage, "_write", write)
+    monkeypatch.setattr(state_storage, "cache", state_storage.StateCache(delay=60))
+    return rows, writes
+
+
+def _message(uid=7):
+    return SimpleNamespace(from_user=SimpleNamespace(id=uid), answer=AsyncMock())
+
+
+@pytest.mark.asyncio
+async def test_state_is_written_once_per_update(table):
+    rows, writes = table
+
+    async def handler(event, data):
+        state = data["user_state"]
+        state["origin"] = "Москва"
+        state["last_question"] = "Куда?"
+        state["destination"] = None
+        return "ok"
+
+    assert await main.state_middleware(handler, _message(), {}) == "ok"
+    assert writes == [
+        ({7: {"origin": "Москва", "last_question": "Куда?", "destination": None}}, [])
+    ]
+
+
+@pytest.mark.asyncio
+async def test_state_is_saved_when_handler_fails(table):
+    rows, writes = table
+
+    async def handler(event, data):
+        data["user_state"]["confirm"] = True
+        raise RuntimeError("message is not modified")
+
+    with pytest.raises(RuntimeError):
+        await main.state_middleware(handler, _message(), {})
+    assert rows == {7: {"confirm": True}}
+    assert len(writes) == 1
+
+
+@pytest.mark.asyncio
+async def test_unchanged_and_cleared_state(table):
+    rows, writes = table
+    rows[7] = {"confirm": True}
+
+    async def read_only(event, data):
+        assert data["user_state"] == {"confirm": True}
+
+    await main.state_middleware(read_only, _message(), {})
+    assert writes == []
+
+    async def cancel(event, data):
+        data["user_state"].clear()
+
+    await main.state_middleware(cancel, _message(), {})
+    assert writes == [({}, [7])] and rows == {}
+
+
+@pytest.mark.asyncio
+async def test_load_failure_answers_service_error(monkeypatch):
+    async def broken(user_id):
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(state_storage, "_load", broken)
+    monkeypatch.setattr(state_storage, "cache", state_storage.StateCache(delay=60))
+    handler = AsyncMock()
+    message = _message()
+    await main.state_middleware(handler, message, {})
+    handler.assert_not_called()
+    message.answer.assert_awaited_once_with(main.SERVICE_ERROR_MESSAGE)
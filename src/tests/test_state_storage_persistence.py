@@ -1,20 +1,32 @@
-import importlib
 import pytest
 
 from bookingassistant import state_storage
 
 
+@pytest.fixture
+def sqlite_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        state_storage, "DATABASE_URL", f"sqlite:///{tmp_path / 'state.db'}"
+    )
+    monkeypatch.setattr(state_storage, "_backend", None)
+    monkeypatch.setattr(state_storage, "cache", state_storage.StateCache())
+
+
+async def restart():
+    """Close the storage and forget everything kept in memory."""
+    await state_storage.close()
+    state_storage.cache.clear()
+
+
 @pytest.mark.asyncio
-async def test_state_persistence():
+async def test_state_persistence(sqlite_storage):
     uid = 123456
-    try:
-        await state_storage.clear_user_state(uid)
-    except state_storage.StateStorageError:
-        pytest.skip("database not available")
     await state_storage.set_user_state(uid, {"foo": "bar"})
     assert await state_storage.get_user_state(uid) == {"foo": "bar"}
-    importlib.reload(state_storage)
-    from bookingassistant.state_storage import get_user_state, clear_user_state
-
-    assert await get_user_state(uid) == {"foo": "bar"}
-    await clear_user_state(uid)
+    # Shutdown writes pending changes, so a fresh process sees them
+    await restart()
+    assert await state_storage.get_user_state(uid) == {"foo": "bar"}
+    await state_storage.clear_user_state(uid)
+    await restart()
+    assert await state_storage.get_user_state(uid) is None
+    await restart()
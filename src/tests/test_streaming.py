@@ -0,0 +1,81 @@
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+os.environ["TELEGRAM_BOT_TOKEN"] = "123:abc"
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+import importlib
+import bookingassistant.config as config
+
+importlib.reload(config)
+import bookingassistant.main as main
+
+
+async def _chunks(*parts, delay=0.0):
+    for part in parts:
+        await asyncio.sleep(delay)
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_answer_streamed_sends_first_chunk_and_final_edit(monkeypatch):
+    monkeypatch.setattr(main, "STREAM_EDIT_INTERVAL", 60)
+    sent = MagicMock()
+    sent.edit_text = AsyncMock()
+    message = MagicMock()
+    message.answer = AsyncMock(return_value=sent)
+
+    await main.answer_streamed(
+        message, _chunks("Итак", "Итак, едем", "Итак, едем?"), "fallback", "Изменил.\n"
+    )
+
+    message.answer.assert_called_once_with("Изменил.\nИтак")
+    sent.edit_text.assert_called_once_with("Изменил.\nИтак, едем?")
+
+
+@pytest.mark.asyncio
+async def test_answer_streamed_uses_fallback_when_budget_runs_out():
+    message = MagicMock()
+    message.answer = AsyncMock()
+
+    with main.update_budget(0.01):
+        await main.answer_streamed(message, _chunks("late", delay=1), "fallback")
+
+    message.answer.assert_called_once_with("fallback")
+
+
+@pytest.mark.asyncio
+async def test_answer_streamed_skips_duplicate_chunks(monkeypatch):
+    monkeypatch.setattr(main, "STREAM_EDIT_INTERVAL", 0)
+    sent = MagicMock()
+    sent.edit_text = AsyncMock()
+    message = MagicMock()
+    message.answer = AsyncMock(return_value=sent)
+
+    await main.answer_streamed(
+        message, _chunks("Итак", "Итак", "Итак, едем?", "Итак, едем?"), "fallback"
+    )
+
+    message.answer.assert_called_once_with("Итак")
+    sent.edit_text.assert_called_once_with("Итак, едем?")
+
+
+@pytest.mark.asyncio
+async def test_answer_streamed_survives_rejected_edit(monkeypatch):
+    from aiogram.exceptions import TelegramBadRequest
+
+    monkeypatch.setattr(main, "STREAM_EDIT_INTERVAL", 0)
+    sent = MagicMock()
+    sent.edit_text = AsyncMock(
+        side_effect=TelegramBadRequest(MagicMock(), "message is not modified")
+    )
+    message = MagicMock()
+    message.answer = AsyncMock(return_value=sent)
+
+    await main.answer_streamed(message, _chunks("Итак", "Итак, едем?"), "fallback")
+
+    sent.edit_text.assert_called_once_with("Итак, едем?")
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+from aioresponses import aioresponses
+from yarl import URL
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
+os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
+os.environ.setdefault("YANDEX_FOLDER_ID", "x")
+
+from bookingassistant import metrics, parser, schemas
+
+
+def _payload(data) -> dict:
+    text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    return {"result": {"alternatives": [{"message": {"text": text}}]}}
+
+
+@pytest.fixture
+def structured(monkeypatch):
+    monkeypatch.setattr(parser, "STRUCTURED_OUTPUT", True)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_parse_slots_sends_schema_and_validates(structured):
+    answer = {"origin": "", "destination": "Москва", "date": "", "transport": "train"}
+    with aioresponses() as m:
+        m.post(parser.API_URL, payload=_payload(answer))
+        slots = await parser.parse_slots("в Москву на поезде")
+        (call,) = m.requests[("POST", URL(parser.API_URL))]
+    assert call.kwargs["json"]["jsonSchema"] == {"schema": schemas.SLOTS_SCHEMA}
+    assert slots == {
+        "origin": None,
+        "destination": "Москва",
+        "date": None,
+        "transport": "train",
+    }
+
+
+@pytest.mark.asyncio
+async def test_malformed_structured_answer_is_counted(structured):
+    answer = {"origin": "", "destination": "Москва", "date": "завтра", "transport": ""}
+    with aioresponses() as m:
+        m.post(parser.API_URL, payload=_payload(answer))
+        m.post(parser.API_URL, payload=_payload("не JSON"))
+        first = await parser.parse_slots("в Москву завтра")
+        second = await parser.parse_slots("в Москву завтра")
+    assert first == second == dict.fromkeys(schemas.SLOTS_SCHEMA["required"])
+    assert metrics.snapshot("gpt.malformed.") == {"gpt.malformed.slots": 2}
+
+
+@pytest.mark.asyncio
+async def test_parse_message_structured(structured):
+    answer = {
+        "action": "cancel",
+        "limit": 0,
+        "destination": "Казань",
+        "origin": "",
+        "date": "",
+        "transport": "",
+    }
+    with aioresponses() as m:
+        m.post(parser.API_URL, payload=_payload(answer))
+        data = await parser.parse_message("отмени поездку в Казань")
+    assert data == {
+        "action": "cancel",
+        "limit": 5,
+        "destination": "Казань",
+        "origin": None,
+        "date": None,
+        "transport": None,
+    }
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"transport": "ship"},
+        {"date": "05.08.2025"},
+        {"origin": 42},
+    ],
+)
+def test_trip_slots_rejects_invalid_values(data):
+    with pytest.raises(schemas.SchemaError):
+        schemas.TripSlots.from_dict(data)
+
+
+def test_history_command_rejects_non_integer_limit():
+    with pytest.raises(schemas.SchemaError):
+        schemas.HistoryCommand.from_dict({"action": "show", "limit": "2"})
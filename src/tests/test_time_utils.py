@@ -7,6 +7,7 @@ os.environ.setdefault("TELEGRAM_BOT_TOKEN", "x")
 os.environ.setdefault("YANDEX_IAM_TOKEN", "x")
 os.environ.setdefault("YANDEX_FOLDER_ID", "x")
 
+from bookingassistant import metrics
 from bookingassistant.utils import normalize_time
 from bookingassistant.parser import API_URL
 
@@ -29,3 +30,25 @@ async def test_normalize_time_text():
             payload={"result": {"alternatives": [{"message": {"text": "20:00"}}]}},
         )
         assert await normalize_time("в восемь вечера") == "20:00"
+
+
+@pytest.mark.asyncio
+async def test_normalize_time_local_forms_skip_model():
+    metrics.reset()
+    with aioresponses() as m:
+        assert await normalize_time("в 8 утра") == "08:00"
+        assert await normalize_time("с 8 до 10 вечера") == "20:00-22:00"
+        assert not m.requests
+    assert metrics.snapshot("time.") == {"time.local": 2}
+
+
+@pytest.mark.asyncio
+async def test_normalize_time_falls_back_to_model():
+    metrics.reset()
+    with aioresponses() as m:
+        m.post(
+            API_URL,
+            payload={"result": {"alternatives": [{"message": {"text": "07:00"}}]}},
+        )
+        assert await normalize_time("как можно раньше") == "07:00"
+    assert metrics.snapshot("time.") == {"time.model": 1}
@@ -0,0 +1,39 @@
+import pytest
+
+from bookingassistant.times import parse_time
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("18:30", "18:30"),
+        ("в 8 утра", "08:00"),
+        ("в 3 часа дня", "15:00"),
+        ("в восемь вечера", "20:00"),
+        ("в 11 ночи", "23:00"),
+        ("полдень", "12:00"),
+        ("в половине седьмого", "06:30"),
+        ("в половине седьмого вечера", "18:30"),
+        ("без четверти девять", "08:45"),
+        ("к вечеру", "18:00"),
+        ("после обеда", "14:00"),
+        ("утром", "06:00-12:00"),
+        ("с 8 до 10", "08:00-10:00"),
+        ("между 9 и 11 вечера", "21:00-23:00"),
+        ("с 10 утра до 2 дня", "10:00-14:00"),
+        ("вечером часов в 7", "19:00"),
+        ("в 7, вечером", "19:00"),
+        ("завтра утром в 9", "09:00"),
+        ("вечером с 7 до 9", "19:00-21:00"),
+    ],
+)
+def test_parse_time(text, expected):
+    assert parse_time(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["как можно раньше", "в 25", "не знаю", "через 2 часа", "через полчаса"],
+)
+def test_parse_time_gives_up(text):
+    assert parse_time(text) is None
@@ -66,3 +66,13 @@ async def test_complete_slots_skipped_when_full():
         assert ("POST", URL(parser.API_URL)) not in m.requests
     assert updated == slots
     assert question is None
+
+
+def test_plane_inflected_cyrillic():
+    assert parse_transport("поеду на самолете") == "plane"
+    assert parse_transport("лучше самолётом") == "plane"
+
+
+def test_railway_abbreviation_only_whole_word():
+    assert parse_transport("билет ж/д до Казани") == "train"
+    assert parse_transport("жду ответа") is None